@@ -0,0 +1,67 @@
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+OVER_SUMMARY_KEYS = ["matchid", "innings", "over"]
+
+
+def legal_ball_mask(df):
+    """Return a boolean mask of the deliveries that count towards an over."""
+    # No-balls are written with a trailing '*' on the delivery
+    illegal = df["delivery"].astype(str).str.endswith("*")
+    if "Column2" in df.columns:
+        # Wides are normally folded into the next ball, but guard against raw rows
+        illegal |= df["Column2"].astype(str).str.contains("wd", regex=False)
+    return ~illegal
+
+
+def over_summary(df):
+    """Aggregate ball-by-ball data into one row per (matchid, innings, over)."""
+    keys = [key for key in OVER_SUMMARY_KEYS if key in df.columns]
+    legal = df["legal"] if "legal" in df.columns else legal_ball_mask(df)
+    balls = pd.DataFrame(
+        {
+            **{key: df[key] for key in keys},
+            "runs": df["total"],
+            "wickets": df["wicket"],
+            "legal_balls": legal.astype("int16"),
+            "extras": df["extras"],
+            "dots": (legal & (df["total"] == 0)).astype("int16"),
+            "boundaries": df["batterrun"].isin([4, 6]).astype("int16"),
+        }
+    )
+
+    summary = balls.groupby(keys, sort=True, observed=True).sum().reset_index()
+
+    # Running totals within each innings
+    innings = summary.groupby(keys[:-1], sort=False, observed=True)
+    summary["score"] = innings["runs"].cumsum()
+    summary["wicketfell"] = innings["wickets"].cumsum()
+    summary["balls_bowled"] = innings["legal_balls"].cumsum()
+    summary["run_rate"] = (
+        summary["score"] * 6 / summary["balls_bowled"].where(summary["balls_bowled"] > 0)
+    ).fillna(0).round(2)
+
+    return summary
+
+
+def worm_scores(df, max_balls):
+    """Return one row per innings and a (innings x legal ball) array of running scores.
+
+    Every innings shares the same legal-ball grid 1..max_balls; balls after the
+    end of an innings are NaN. Extras bowled after the last legal ball are left out.
+    """
+    keys = [key for key in ["matchid", "innings"] if key in df.columns]
+    legal = df["legal"] if "legal" in df.columns else legal_ball_mask(df)
+    balls = df.loc[legal, keys + ["battingteam", "legal_ball", "score"]]
+
+    innings = balls.groupby(keys, sort=False, observed=True)
+    index = innings["battingteam"].first().reset_index()
+    codes = innings.ngroup().to_numpy()
+
+    ball = balls["legal_ball"].to_numpy().astype("int64")
+    in_grid = (ball >= 1) & (ball <= max_balls)
+    scores = np.full((len(index), max_balls), np.nan)
+    scores[codes[in_grid], ball[in_grid] - 1] = balls["score"].to_numpy()[in_grid]
+    return index, scores
@@ -0,0 +1,302 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import schema
+from color_scheme import ColorScheme
+from lazy import lazy_import
+from match import Match
+from season import Season
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+DEFAULT_SIZES = [1, 10, 100]
+
+# Outcome of each delivery in the generated matches and how often it happens
+OUTCOMES = ["0", "1", "2", "3", "4", "6", "W", "lb", "wd", "nb"]
+OUTCOME_WEIGHTS = [0.35, 0.33, 0.07, 0.005, 0.11, 0.045, 0.045, 0.02, 0.02, 0.005]
+
+DISMISSAL_TYPES = ["Bowled", "Caught Out", "Caught Out", "Caught Out", "LBW", "Run Out", "Stumped Out"]
+
+VENUES = [
+    "Arun Jaitley Stadium, Delhi",
+    "M.Chinnaswamy Stadium, Bengaluru",
+    "Wankhede Stadium, Mumbai",
+    "Eden Gardens, Kolkata",
+    "MA Chidambaram Stadium, Chennai",
+]
+
+SEASON_START = datetime.date(2024, 3, 15)
+
+# Match methods timed for every match, in the order a session calls them
+MATCH_STAGES = ["read_csv", "preprocess_data", "calculate_run_rate", "number_of_wicket_fell_in_an_over"]
+PLOT_STAGES = sorted(name for name in dir(Match) if name.startswith("plot_"))
+
+
+def load_squads(player_info_csv=None, squad_size=11):
+    """Return {team: [players]} for the teams that have a colour scheme."""
+    squads = {}
+    if player_info_csv is not None and os.path.exists(player_info_csv):
+        players = pd.read_csv(player_info_csv, usecols=["player", "team"])
+        for team, names in players.groupby("team")["player"]:
+            if team in ColorScheme.COLOR_SCHEMES and len(names) >= squad_size:
+                squads[team] = names.tolist()[:squad_size]
+    if len(squads) < 2:
+        squads = {
+            team: [f"{team} Player {number}" for number in range(1, squad_size + 1)]
+            for team in ColorScheme.COLOR_SCHEMES
+        }
+    return squads
+
+
+def _innings_rows(rng, inning, batting, bowling, target=None, overs=20):
+    """Simulate one innings in the extractor's row layout."""
+    batting_team, batters = batting
+    bowling_team, bowlers = bowling[0], bowling[1][-5:]
+    outcomes = rng.choice(len(OUTCOMES), size=overs * 6 * 2, p=OUTCOME_WEIGHTS)
+    timeouts = {int(rng.integers(6, 10)), int(rng.integers(13, 17))}
+
+    rows = []
+    striker, non_striker, next_batter = 0, 1, 2
+    balls = score = wickets = pending_wides = 0
+    for outcome in outcomes:
+        if balls == overs * 6 or wickets == 10 or (target is not None and score > target):
+            break
+        result = OUTCOMES[outcome]
+        if result == "wd":
+            # Wides are folded into the next written ball
+            pending_wides += 1
+            continue
+
+        over, ball = divmod(balls, 6)
+        noball = result == "nb"
+        batter_runs = int(result) if result.isdigit() else 0
+        if noball:
+            batter_runs = int(rng.choice([0, 1, 4], p=[0.5, 0.35, 0.15]))
+        extras = pending_wides + noball + (result == "lb")
+        total = batter_runs + extras
+        wicket = result == "W"
+        dismissal = DISMISSAL_TYPES[rng.integers(len(DISMISSAL_TYPES))] if wicket else None
+        score += total
+        wickets += wicket
+        last_ball = not noball and ball == 5
+
+        rows.append(
+            {
+                "innings": inning,
+                "over": over + 1,
+                "delivery": f"{over}.{ball + 1}" + ("*" if noball else ""),
+                "battingteam": batting_team,
+                "bowlingteam": bowling_team,
+                "Column2": {"lb": "1lb"}.get(result, result),
+                "res": {"lb": "1lb"}.get(result, result),
+                "impbat": 0,
+                "batters": batters[striker],
+                "bowlers": bowlers[over % len(bowlers)],
+                "impbowl": 0,
+                "wide": pending_wides,
+                "extras": extras,
+                "noball": int(noball),
+                "legbye": int(result == "lb"),
+                "bye": 0,
+                "batterrun": batter_runs,
+                "wicket": int(wicket),
+                "batterdismissed": batters[striker] if wicket else None,
+                "dismissaltype": dismissal,
+                "total": total,
+                "score": score,
+                "wicketfell": wickets,
+                "strategictimeout": 1 if last_ball and over + 1 in timeouts else None,
+                "battingposition": striker + 1,
+                "bowlerwicket": 1 if wicket and dismissal != "Run Out" else None,
+                "powerplay": int(over < 6),
+            }
+        )
+        pending_wides = 0
+
+        if wicket:
+            striker = next_batter
+            next_batter += 1
+        elif (batter_runs + (result == "lb")) % 2:
+            striker, non_striker = non_striker, striker
+        if not noball:
+            balls += 1
+            if last_ball:
+                striker, non_striker = non_striker, striker
+
+    return rows, score
+
+
+def generate_match(matchid, rng, squads):
+    """Generate one realistic T20 match in the extractor's 30-column layout."""
+    home, away = rng.choice(list(squads), size=2, replace=False)
+    first = (home, squads[home])
+    second = (away, squads[away])
+
+    first_rows, target = _innings_rows(rng, 1, first, second)
+    second_rows, _ = _innings_rows(rng, 2, second, first, target=target)
+
+    df = pd.DataFrame(first_rows + second_rows)
+    df.insert(0, "matchid", matchid)
+    df.insert(1, "date", (SEASON_START + datetime.timedelta(days=matchid)).strftime(schema.DATE_FORMAT))
+    df.insert(2, "venue", VENUES[matchid % len(VENUES)])
+    return df[schema.COLUMNS]
+
+
+def generate_season(n_matches, data_dir, seed=0, player_info_csv=None):
+    """Write n synthetic match CSVs into data_dir and return their paths."""
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    squads = load_squads(player_info_csv)
+    paths = []
+    for matchid in range(n_matches):
+        path = os.path.join(data_dir, f"{matchid}.csv")
+        generate_match(matchid, rng, squads).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def _loaded_match(path, player_info_csv):
+    match = Match(path, player_info_csv)
+    match.read_csv()
+    match.preprocess_data()
+    return match
+
+
+def _stage_calls(stage, paths, player_info_csv):
+    """Prepare the untimed state for a stage and return the calls to time."""
+    if stage == "read_csv":
+        matches = [Match(path, player_info_csv) for path in paths]
+        return [match.read_csv for match in matches]
+    if stage == "preprocess_data":
+        matches = [Match(path, player_info_csv) for path in paths]
+        for match in matches:
+            match.read_csv()
+        return [match.preprocess_data for match in matches]
+    if stage == "season_load":
+        return [Season(os.path.dirname(paths[0])).read_csv]
+
+    matches = [_loaded_match(path, player_info_csv) for path in paths]
+    if stage in PLOT_STAGES:
+        return [lambda match=match: getattr(match, stage)(show=False) for match in matches]
+    return [getattr(match, stage) for match in matches]
+
+
+def time_stage(stage, paths, player_info_csv, repeat=3):
+    """Return the best wall time of a stage over every match, and its peak traced memory."""
+    best = None
+    for _ in range(repeat):
+        calls = _stage_calls(stage, paths, player_info_csv)
+        start = time.perf_counter()
+        for call in calls:
+            call()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Memory is traced in a separate run because tracing slows every allocation
+    calls = _stage_calls(stage, paths, player_info_csv)
+    tracemalloc.start()
+    for call in calls:
+        call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(sizes, stages, repeat=3, seed=0, player_info_csv=None):
+    """Benchmark every stage on generated seasons of each size."""
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as data_dir:
+            paths = generate_season(size, data_dir, seed, player_info_csv)
+            deliveries = sum(len(pd.read_csv(path, usecols=["delivery"])) for path in paths)
+            results[str(size)] = {}
+            for stage in stages:
+                seconds, peak = time_stage(stage, paths, player_info_csv, repeat)
+                results[str(size)][stage] = {
+                    "seconds": round(seconds, 6),
+                    "matches_per_second": round(size / seconds, 2) if seconds else None,
+                    "deliveries_per_second": round(deliveries / seconds, 2) if seconds else None,
+                    "peak_memory_mb": round(peak / 2**20, 3),
+                }
+                print(f"{size:>6} matches  {stage:<36} {seconds:10.4f} s  {peak / 2**20:9.2f} MB")
+    return results
+
+
+def environment():
+    """Describe the interpreter and library versions the results were measured with."""
+    import plotly
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plotly": plotly.__version__,
+    }
+
+
+def compare(baseline, current):
+    """Print the speed-up of every stage relative to a baseline result file."""
+    for size, stages in current["results"].items():
+        for stage, result in stages.items():
+            before = baseline["results"].get(size, {}).get(stage)
+            if before is None:
+                continue
+            ratio = before["seconds"] / result["seconds"] if result["seconds"] else float("inf")
+            memory = result["peak_memory_mb"] - before["peak_memory_mb"]
+            print(f"{size:>6} matches  {stage:<36} {ratio:6.2f}x faster  {memory:+9.2f} MB")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CricStat on synthetic seasons.")
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="numbers of matches (1 to 10000)"
+    )
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=MATCH_STAGES + PLOT_STAGES + ["season_load"],
+        default=MATCH_STAGES + PLOT_STAGES + ["season_load"],
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage, best is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--player-info",
+        default=os.path.join("data", "playerdata.csv"),
+        help="player information CSV used for squad names",
+    )
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    for size in args.sizes:
+        if not 1 <= size <= 10000:
+            print(f"Error: Season size {size} is outside 1 to 10000 matches.")
+            return
+
+    results = {
+        "environment": environment(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": run_benchmarks(args.sizes, args.stages, args.repeat, args.seed, args.player_info),
+    }
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(json.load(file), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import preprocessing
+import schema
+import storage
+from lazy import lazy_import
+from season import MATCH_FILE_PATTERN, Season
+
+np = lazy_import("numpy")
+
+MANIFEST_FILE = "_ingest.json"
+
+
+def file_stamp(path):
+    """Return the modification time and size of a file, which change whenever it is rewritten."""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _first_row(mask):
+    """Return the position of the first True value of a mask, or None."""
+    positions = np.flatnonzero(np.asarray(mask))
+    return int(positions[0]) if len(positions) else None
+
+
+def validate(df, matchid=None):
+    """Check a match against the schema and its own running totals.
+
+    Returns a list of problems, empty for a valid match. matchid is the id the
+    file is named after.
+    """
+    missing = [column for column in schema.COLUMNS if column not in df.columns]
+    if missing:
+        return [f"missing columns: {', '.join(missing)}"]
+    if df.empty:
+        return ["no deliveries"]
+
+    problems = []
+    matchids = df["matchid"].unique()
+    if len(matchids) != 1:
+        problems.append(f"{len(matchids)} match ids in one file")
+    elif matchid is not None and int(matchids[0]) != matchid:
+        problems.append(f"match id {int(matchids[0])} does not match the file name")
+
+    checks = []
+    innings = df["innings"].to_numpy()
+    checks.append(("innings go backwards", np.diff(innings, prepend=innings[0]) < 0))
+
+    # Within an innings the over and the delivery never go backwards
+    same_innings = np.concatenate([[False], innings[1:] == innings[:-1]])
+    over = df["over"].to_numpy()
+    delivery = df["delivery"].astype(str)
+    ball = preprocessing._delivery_to_balls(delivery).to_numpy()
+    checks.append(("unparsable delivery", np.isnan(ball)))
+    checks.append(("over goes backwards", same_innings & (np.diff(over, prepend=over[0]) < 0)))
+    checks.append(("delivery goes backwards", same_innings & (np.diff(ball, prepend=ball[0]) < 0)))
+    # Deliveries count completed overs, so over 1 holds deliveries 0.1 to 0.6
+    completed_overs = delivery.str.partition(".")[0].str.extract(r"^(\d+)$", expand=False).astype(float)
+    checks.append(("over does not match the delivery", ~np.isnan(ball) & (completed_overs.to_numpy() + 1 != over)))
+
+    by_innings = df.groupby("innings", sort=False, observed=True)
+    score = by_innings["total"].cumsum()
+    checks.append(("score is not the running total of total", (score != df["score"]).to_numpy()))
+    wickets = by_innings["wicket"].cumsum()
+    checks.append(("wicketfell is not the running count of wicket", (wickets != df["wicketfell"]).to_numpy()))
+
+    checks.append(("repeated delivery", df.duplicated().to_numpy()))
+
+    for message, failed in checks:
+        row = _first_row(failed)
+        if row is not None:
+            problems.append(f"{message} (row {row + 1}, {int(np.sum(failed))} rows)")
+    return problems
+
+
+def ingest_file(path):
+    """Read and validate one match file; return its manifest entry."""
+    entry = {"hash": storage.file_hash(path), "stamp": file_stamp(path)}
+    name_match = MATCH_FILE_PATTERN.match(os.path.basename(path))
+    try:
+        df = storage.read_match(path)
+    except (ValueError, KeyError, OSError) as error:
+        return {**entry, "rows": 0, "errors": [f"could not be read: {error}"]}
+    if df is None:
+        return {**entry, "rows": 0, "errors": ["could not be read"]}
+
+    entry["rows"] = len(df)
+    if "innings" in df.columns:
+        entry["innings_rows"] = {
+            str(inning): int(rows) for inning, rows in df["innings"].value_counts(sort=False).sort_index().items()
+        }
+    entry["errors"] = validate(df, int(name_match.group(1)) if name_match else None)
+    return entry
+
+
+class MatchManifest:
+    """Content hashes, row counts and validation results of the match files in a directory."""
+
+    def __init__(self, data_dir, max_workers=None):
+        self.data_dir = data_dir
+        self.max_workers = max_workers
+        self.path = os.path.join(data_dir, MANIFEST_FILE)
+        self.matches = {}
+        if os.path.exists(self.path):
+            with open(self.path) as file:
+                self.matches = json.load(file)["matches"]
+
+    def save(self):
+        with open(self.path, "w") as file:
+            json.dump({"matches": self.matches}, file, indent=2, sort_keys=True)
+
+    def refresh(self):
+        """Ingest new and changed match files and forget removed ones.
+
+        A file whose size and modification time are unchanged is not read at
+        all; a file that was rewritten with the same contents is only rehashed.
+        Returns the names of the files in each outcome.
+        """
+        paths = {os.path.basename(path): path for path in Season(self.data_dir).match_files()}
+        report = {"new": [], "changed": [], "unchanged": [], "removed": [], "invalid": [], "duplicates": []}
+
+        to_read = []
+        for name, path in paths.items():
+            entry = self.matches.get(name)
+            if entry is not None and entry["stamp"] == file_stamp(path):
+                report["unchanged"].append(name)
+            elif entry is not None and entry["hash"] == storage.file_hash(path):
+                entry["stamp"] = file_stamp(path)
+                report["unchanged"].append(name)
+            else:
+                to_read.append(name)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            entries = list(executor.map(lambda name: ingest_file(paths[name]), to_read))
+        for name, entry in zip(to_read, entries):
+            report["changed" if name in self.matches else "new"].append(name)
+            self.matches[name] = entry
+
+        for name in sorted(set(self.matches) - set(paths)):
+            del self.matches[name]
+            report["removed"].append(name)
+
+        # The first file with some contents owns them; identical later files are duplicates
+        owners = {}
+        for name in sorted(self.matches, key=_match_order):
+            entry = self.matches[name]
+            entry.pop("duplicate_of", None)
+            if entry["hash"] in owners:
+                entry["duplicate_of"] = owners[entry["hash"]]
+                report["duplicates"].append(name)
+            else:
+                owners[entry["hash"]] = name
+            if entry["errors"]:
+                report["invalid"].append(name)
+
+        self.save()
+        return report
+
+    def valid_files(self):
+        """Return {file name: content hash} of the valid match files that are not duplicates."""
+        return {
+            name: entry["hash"]
+            for name, entry in sorted(self.matches.items(), key=lambda item: _match_order(item[0]))
+            if not entry["errors"] and "duplicate_of" not in entry
+        }
+
+
+def _match_order(name):
+    name_match = MATCH_FILE_PATTERN.match(name)
+    return (int(name_match.group(1)), name) if name_match else (float("inf"), name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate new and changed match files and record them in a manifest.")
+    parser.add_argument("data_dir", help="directory containing the match files")
+    parser.add_argument("--workers", type=int, default=None, help="files read in parallel")
+    args = parser.parse_args(argv)
+
+    manifest = MatchManifest(args.data_dir, args.workers)
+    report = manifest.refresh()
+    print(
+        f"{len(report['new'])} new, {len(report['changed'])} changed, "
+        f"{len(report['unchanged'])} unchanged and {len(report['removed'])} removed match files."
+    )
+    for name in report["invalid"]:
+        for problem in manifest.matches[name]["errors"]:
+            print(f"Error: {name}: {problem}")
+    for name in report["duplicates"]:
+        print(f"Error: {name} duplicates {manifest.matches[name]['duplicate_of']}")
+
+
+if __name__ == "__main__":
+    main()
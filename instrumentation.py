@@ -0,0 +1,202 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+# Set CRICSTAT_TRACE=1 (or =memory to also trace allocations) to enable at import
+ENV_VARIABLE = "CRICSTAT_TRACE"
+
+
+class _State:
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.spans = []
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+
+_state = _State()
+
+# Returned by span() while disabled, so a disabled span allocates nothing
+_DISABLED_SPAN = nullcontext()
+
+
+def enable(trace_memory=False):
+    """Start recording spans and counters, optionally with peak allocations per span."""
+    _state.enabled = True
+    _state.trace_memory = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    """Stop recording; instrumented code runs at full speed again."""
+    _state.enabled = False
+    if _state.trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _state.trace_memory = False
+
+
+def is_enabled():
+    return _state.enabled
+
+
+def reset():
+    """Discard every recorded span and counter."""
+    with _state.lock:
+        _state.spans = []
+        _state.counters = {}
+
+
+class _Span:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = getattr(_state.local, "stack", None)
+        if stack is None:
+            stack = _state.local.stack = []
+        if _state.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # Hand the peak so far to the enclosing span before measuring this one
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.memory_start = current
+            self.peak = current
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter_ns()
+        stack = _state.local.stack
+        stack.pop()
+        record = {
+            "name": self.name,
+            "start_ns": self.start,
+            "duration_ns": end - self.start,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "depth": len(stack),
+            "args": self.args,
+        }
+        if _state.trace_memory and tracemalloc.is_tracing():
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            record["peak_bytes"] = self.peak - self.memory_start
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+        with _state.lock:
+            _state.spans.append(record)
+        return False
+
+
+def span(name, **args):
+    """Time a block of code as a named stage."""
+    if not _state.enabled:
+        return _DISABLED_SPAN
+    return _Span(name, args)
+
+
+def count(name, value=1):
+    """Add to a named counter, such as rows processed or traces added."""
+    if _state.enabled:
+        with _state.lock:
+            _state.counters[name] = _state.counters.get(name, 0) + value
+
+
+def traced(name):
+    """Decorate a function so each call is recorded as a span while enabled."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return func(*args, **kwargs)
+            with _Span(name, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def collect():
+    """Return the recorded spans and counters, e.g. to send them back from a worker."""
+    with _state.lock:
+        return {"spans": list(_state.spans), "counters": dict(_state.counters)}
+
+
+def merge(records):
+    """Add spans and counters recorded in another process."""
+    with _state.lock:
+        _state.spans.extend(records["spans"])
+        for name, value in records["counters"].items():
+            _state.counters[name] = _state.counters.get(name, 0) + value
+
+
+def summary():
+    """Aggregate the spans by name into calls, total and maximum time, and peak memory."""
+    stages = {}
+    for record in collect()["spans"]:
+        stage = stages.setdefault(
+            record["name"], {"calls": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+        )
+        seconds = record["duration_ns"] / 1e9
+        stage["calls"] += 1
+        stage["total_seconds"] += seconds
+        stage["max_seconds"] = max(stage["max_seconds"], seconds)
+        if "peak_bytes" in record:
+            stage["peak_bytes"] = max(stage.get("peak_bytes", 0), record["peak_bytes"])
+    return stages
+
+
+def export_json(path):
+    """Write the spans, counters and per-stage summary as JSON."""
+    records = collect()
+    with open(path, "w") as file:
+        json.dump({**records, "stages": summary()}, file, indent=2)
+
+
+def export_chrome_trace(path):
+    """Write the spans in Chrome trace format for chrome://tracing or Perfetto."""
+    records = collect()
+    events = []
+    for record in records["spans"]:
+        args = dict(record["args"])
+        if "peak_bytes" in record:
+            args["peak_bytes"] = record["peak_bytes"]
+        events.append(
+            {
+                "name": record["name"],
+                "ph": "X",
+                "ts": record["start_ns"] / 1000,
+                "dur": record["duration_ns"] / 1000,
+                "pid": record["pid"],
+                "tid": record["tid"],
+                "args": args,
+            }
+        )
+    end = max((event["ts"] + event["dur"] for event in events), default=0)
+    for name, value in records["counters"].items():
+        events.append({"name": name, "ph": "C", "ts": end, "pid": os.getpid(), "args": {name: value}})
+    with open(path, "w") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+def export(path):
+    """Write a Chrome trace for .trace.json paths and the plain JSON layout otherwise."""
+    if path.endswith(".trace.json"):
+        export_chrome_trace(path)
+    else:
+        export_json(path)
+
+
+if os.environ.get(ENV_VARIABLE):
+    enable(trace_memory=os.environ[ENV_VARIABLE] == "memory")
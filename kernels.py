@@ -0,0 +1,143 @@
+from aggregations import legal_ball_mask
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+INNINGS_KEYS = ["matchid", "innings"]
+
+BOUNDARY_RUNS = [4, 6]
+
+# Legal balls either side of an event used for the before/after run rates
+DEFAULT_WINDOW = 12
+
+
+def _innings_keys(df):
+    return [key for key in INNINGS_KEYS if key in df.columns]
+
+
+def _legal(df):
+    return df["legal"] if "legal" in df.columns else legal_ball_mask(df)
+
+
+def _innings_number(df):
+    """Number consecutive innings 0, 1, 2, ... in delivery order."""
+    keys = _innings_keys(df)
+    if not keys:
+        return pd.Series(0, index=df.index)
+    changed = pd.Series(False, index=df.index)
+    for key in keys:
+        column = df[key]
+        changed |= column.ne(column.shift())
+    return changed.cumsum() - 1
+
+
+def _run_length(values, resets, groups):
+    """Sum values since the last reset within each group, restarting at every reset.
+
+    A reset row starts a new segment, so it only contributes its own value.
+    """
+    if not groups:
+        groups = [pd.Series(0, index=values.index)]
+    segments = resets.astype("int32").groupby(groups, sort=False).cumsum()
+    return values.groupby([*groups, segments], sort=False).cumsum()
+
+
+def balls_since(df, event, by=None):
+    """Legal balls bowled since the last event in the innings, 0 on the event ball."""
+    groups = [df[key] for key in _innings_keys(df)]
+    if by is not None:
+        groups.append(df[by])
+    counted = (_legal(df) & ~event).astype("int16")
+    return _run_length(counted, event, groups).astype("int16")
+
+
+def balls_since_boundary(df, by=None):
+    """Legal balls since the last four or six, for the team or (by='batters') each batter."""
+    return balls_since(df, df["batterrun"].isin(BOUNDARY_RUNS), by)
+
+
+def balls_since_wicket(df):
+    """Legal balls since the last wicket fell in the innings."""
+    return balls_since(df, df["wicket"].astype(bool))
+
+
+def dot_streak(df, by=None):
+    """Length of the current run of consecutive dot balls, 0 on a scoring delivery."""
+    groups = [df[key] for key in _innings_keys(df)]
+    if by is not None:
+        groups.append(df[by])
+    dots = _legal(df) & (df["total"] == 0)
+    return _run_length(dots.astype("int16"), ~dots, groups).astype("int16")
+
+
+def run_rate_around(df, event, window=DEFAULT_WINDOW):
+    """Run rate in the legal balls before and after each event, NaN on other deliveries.
+
+    The event ball itself is in neither window; windows are cut short at the
+    start and end of the innings.
+    """
+    legal = _legal(df).to_numpy()
+    runs = df["total"].to_numpy(dtype=np.int64)
+    innings = _innings_number(df).to_numpy()
+
+    # Running score and legal-ball count within each innings
+    starts = np.flatnonzero(np.r_[True, innings[1:] != innings[:-1]])
+    lengths = np.diff(np.r_[starts, len(df)])
+    score = np.cumsum(runs)
+    score -= np.repeat(np.r_[0, score[starts[1:] - 1]], lengths)
+    balls = np.cumsum(legal)
+    balls -= np.repeat(np.r_[0, balls[starts[1:] - 1]], lengths)
+    # Extras belong to the next legal ball
+    ball_number = balls + ~legal
+
+    # Score after each legal ball, keyed so that every innings sorts after the last
+    stride = len(df) + window + 2
+    legal_keys = innings[legal] * stride + balls[legal]
+    legal_scores = score[legal]
+    innings_balls = np.zeros(len(starts), dtype=np.int64)
+    np.maximum.at(innings_balls, innings, balls)
+
+    def score_after(ball):
+        ball = np.clip(ball, 0, innings_balls[innings])
+        position = np.searchsorted(legal_keys, innings * stride + ball)
+        position = np.minimum(position, max(len(legal_keys) - 1, 0))
+        return np.where(ball > 0, legal_scores[position] if len(legal_scores) else 0, 0), ball
+
+    end_before, balls_end_before = score_after(ball_number - 1)
+    start_before, balls_start_before = score_after(ball_number - 1 - window)
+    start_after, balls_start_after = score_after(ball_number)
+    end_after, balls_end_after = score_after(ball_number + window)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        before = (end_before - start_before) * 6 / (balls_end_before - balls_start_before)
+        after = (end_after - start_after) * 6 / (balls_end_after - balls_start_after)
+
+    event = np.asarray(event, dtype=bool)
+    before = np.where(event & np.isfinite(before), before, np.nan)
+    after = np.where(event & np.isfinite(after), after, np.nan)
+    return pd.DataFrame(
+        {"run_rate_before": before.round(2), "run_rate_after": after.round(2)}, index=df.index
+    )
+
+
+def derived_columns(df, window=DEFAULT_WINDOW):
+    """Compute every streak and before/after column for ball-by-ball data."""
+    wickets = df["wicket"].astype(bool)
+    columns = {
+        "balls_since_boundary": balls_since_boundary(df),
+        "batter_balls_since_boundary": balls_since_boundary(df, by="batters"),
+        "balls_since_wicket": balls_since_wicket(df),
+        "dot_streak": dot_streak(df),
+    }
+    around_wicket = run_rate_around(df, wickets, window)
+    columns["run_rate_before_wicket"] = around_wicket["run_rate_before"]
+    columns["run_rate_after_wicket"] = around_wicket["run_rate_after"]
+
+    if "strategictimeout" in df.columns:
+        timeouts = df["strategictimeout"].fillna(0).astype(bool)
+        around_timeout = run_rate_around(df, timeouts, window)
+        columns["run_rate_before_timeout"] = around_timeout["run_rate_before"]
+        columns["run_rate_after_timeout"] = around_timeout["run_rate_after"]
+
+    return pd.DataFrame(columns, index=df.index)
@@ -0,0 +1,34 @@
+import importlib
+import importlib.util
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access."""
+
+    def __init__(self, name):
+        self.__dict__["_lazy_name"] = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__dict__["_lazy_name"])
+        # Later lookups find the module's attributes directly on this object
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f"<lazy module '{self.__dict__['_lazy_name']}'>"
+
+
+def is_available(name):
+    """Check whether a module's top-level package is installed without importing it."""
+    return importlib.util.find_spec(name.partition(".")[0]) is not None
+
+
+def lazy_import(name, optional=False):
+    """Return a module that is only imported when first used.
+
+    Optional modules that are not installed give None, like the
+    try/except ImportError pattern they replace.
+    """
+    if optional and not is_available(name):
+        return None
+    return LazyModule(name)
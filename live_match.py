@@ -0,0 +1,164 @@
+import csv
+import io
+
+from phases import DEFAULT_FORMAT, PHASE_DEFINITIONS, get_phases, phase_of_ball
+from records import Delivery, NameTable, Over
+
+
+class LiveMatch:
+    """Keep match aggregates up to date one delivery at a time."""
+
+    def __init__(self, csv_file_path=None, match_format=DEFAULT_FORMAT):
+        self.csv_file_path = csv_file_path
+        if match_format not in PHASE_DEFINITIONS:
+            raise ValueError(f"Unknown match format '{match_format}'; expected one of {', '.join(PHASE_DEFINITIONS)}.")
+        self.phases = get_phases(match_format)
+        self.innings = {}
+        self.batting_teams = {}
+        self.names = NameTable()
+        self._phase_of_ball = phase_of_ball(self.phases)
+        self._offset = 0
+        self._header = None
+
+    def _new_innings(self):
+        return {
+            "score": 0,
+            "wickets": 0,
+            "balls": 0,
+            "balls_since_boundary": 0,
+            "overs": [],
+            "phases": {
+                over_type: {"runs": 0, "wickets": 0, "balls": 0, "dots": 0, "boundaries": 0}
+                for over_type in self.phases
+            },
+        }
+
+    def add_delivery(self, delivery):
+        """Update the aggregates with one ball-by-ball row (a dict or a Delivery)."""
+        row = None
+        if not isinstance(delivery, Delivery):
+            row = delivery
+            delivery = Delivery.from_row(row, self.names)
+
+        inning = delivery.innings
+        runs = delivery.total
+        wicket = delivery.wicket
+        legal = delivery.legal
+        boundary = delivery.boundary
+
+        state = self.innings.get(inning)
+        if state is None:
+            state = self.innings[inning] = self._new_innings()
+            self.batting_teams[inning] = row.get("battingteam") if row is not None else None
+
+        # Extras belong to the phase of the next legal ball
+        ball_number = state["balls"] + 1
+
+        state["score"] += runs
+        state["wickets"] += wicket
+        state["balls"] += legal
+
+        if boundary:
+            state["balls_since_boundary"] = 0
+        elif legal:
+            state["balls_since_boundary"] += 1
+
+        # Start a new entry when the over changes
+        overs = state["overs"]
+        if not overs or overs[-1].over != delivery.over:
+            overs.append(Over(delivery.over))
+        current = overs[-1]
+        current.runs += runs
+        current.wickets += wicket
+        current.legal_balls += legal
+        current.score = state["score"]
+        current.balls_bowled = state["balls"]
+
+        phase = (
+            self._phase_of_ball[ball_number] if ball_number < len(self._phase_of_ball) else None
+        )
+        if phase is not None:
+            totals = state["phases"][phase]
+            totals["runs"] += runs
+            totals["wickets"] += wicket
+            totals["balls"] += legal
+            totals["dots"] += legal and runs == 0
+            totals["boundaries"] += boundary
+
+    def read_new_rows(self):
+        """Add any rows appended to the CSV since the last call."""
+        if self.csv_file_path is None:
+            print("Error: No CSV file to follow.")
+            return 0
+
+        try:
+            with open(self.csv_file_path, "rb") as file:
+                file.seek(self._offset)
+                chunk = file.read()
+        except FileNotFoundError:
+            print(f"Error: File '{self.csv_file_path}' not found.")
+            return 0
+
+        # Leave a partially written last line for the next call
+        complete = chunk[: chunk.rfind(b"\n") + 1]
+        self._offset += len(complete)
+
+        lines = io.StringIO(complete.decode("utf-8"), newline="")
+        if self._header is None:
+            self._header = next(csv.reader(lines), None)
+            if self._header is None:
+                return 0
+
+        added = 0
+        for row in csv.reader(lines):
+            if row:
+                self.add_delivery(dict(zip(self._header, row)))
+                added += 1
+        return added
+
+    @staticmethod
+    def _run_rates(overs):
+        return [
+            (entry.over, round(entry.score * 6 / entry.balls_bowled, 2))
+            if entry.balls_bowled
+            else (entry.over, 0)
+            for entry in overs
+        ]
+
+    @staticmethod
+    def _wickets(overs):
+        return [(entry.over, entry.wickets) for entry in overs]
+
+    def calculate_run_rate(self):
+        """Return (over, run rate) pairs for both innings."""
+        empty = {"overs": []}
+        return (
+            self._run_rates(self.innings.get(1, empty)["overs"]),
+            self._run_rates(self.innings.get(2, empty)["overs"]),
+        )
+
+    def number_of_wicket_fell_in_an_over(self):
+        """Return (over, wickets) pairs for both innings."""
+        empty = {"overs": []}
+        return (
+            self._wickets(self.innings.get(1, empty)["overs"]),
+            self._wickets(self.innings.get(2, empty)["overs"]),
+        )
+
+    def snapshot(self):
+        """Return a copy of the current aggregates for charting."""
+        snapshot = {}
+        for inning, state in self.innings.items():
+            snapshot[inning] = {
+                "battingteam": self.batting_teams.get(inning),
+                "score": state["score"],
+                "wickets": state["wickets"],
+                "balls": state["balls"],
+                "balls_since_boundary": state["balls_since_boundary"],
+                "run_rates": self._run_rates(state["overs"]),
+                "wickets_per_over": self._wickets(state["overs"]),
+                "phases": {
+                    over_type: dict(totals) for over_type, totals in state["phases"].items()
+                },
+            }
+        return snapshot
@@ -1,16 +1,219 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import instrumentation as ins
+import plotting_utils as pu
+import schema
 from match import Match
+from season import Season
+from storage import file_hash
+
+# Chart type names accepted on the command line and the Match method drawing each one
+CHART_TYPES = {
+    "score_vs_delivery": "plot_score_vs_delivery",
+    "run_rate": "plot_run_rate",
+    "run_rate_bar_chart": "plot_run_rate_bar_chart",
+    "scatter_chart": "plot_scatter_chart",
+}
+
+# Columns each chart reads, so a match is loaded without the ones no requested chart uses
+PLOT_COLUMNS = {
+    "score_vs_delivery": ["innings", "delivery", "battingteam", "score", "powerplay"],
+    "run_rate": [
+        "innings", "over", "delivery", "battingteam", "Column2", "extras", "batterrun", "wicket",
+        "batterdismissed", "batters", "total",
+    ],
+    "run_rate_bar_chart": [
+        "innings", "over", "delivery", "battingteam", "Column2", "extras", "batterrun", "wicket",
+        "total", "strategictimeout",
+    ],
+    "scatter_chart": ["innings", "delivery", "res"],
+}
+
+FORMATS = ("html", "png", "json")
+
+RENDER_CACHE_FILE = "render_cache.json"
+
+
+def chart_columns(charts):
+    """Return the columns needed to draw all of the given charts, in file order."""
+    needed = {column for chart in charts for column in PLOT_COLUMNS[chart]}
+    return [column for column in schema.COLUMNS if column in needed]
+
 
-def main():
-    # Instantiate Match object with the CSV file path
-    csv_file_path = "path/to/your/csv_file.csv"
-    match = Match(csv_file_path)
-    
-    # Read CSV file and preprocess data
-    match.read_csv()
+def write_figure(fig, path_without_extension, formats):
+    """Write a figure in each requested format and return the written paths."""
+    paths = []
+    for file_format in formats:
+        path = f"{path_without_extension}.{file_format}"
+        with ins.span("write_figure", format=file_format):
+            if file_format == "html":
+                fig.write_html(path, include_plotlyjs="cdn")
+            elif file_format == "png":
+                # Static export needs the kaleido package
+                fig.write_image(path)
+            elif file_format == "json":
+                # The template is named, not repeated; see plotting_utils.merge_template
+                with open(path, "w") as file:
+                    file.write(pu.figure_json(fig))
+        paths.append(path)
+    return paths
+
+
+def render_match(csv_file_path, player_info_csv, charts, formats, output_dir):
+    """Render the requested charts for one match without opening a browser."""
+    match = Match(csv_file_path, player_info_csv)
+    match.read_csv(columns=chart_columns(charts))
     match.preprocess_data()
-    
-    # Generate graphs
-    match.generate_graphs()
+
+    match_name = os.path.splitext(os.path.basename(csv_file_path))[0]
+    match_dir = os.path.join(output_dir, match_name)
+    os.makedirs(match_dir, exist_ok=True)
+
+    paths = []
+    for chart in charts:
+        fig = getattr(match, CHART_TYPES[chart])(show=False)
+        if fig is not None:
+            paths += write_figure(fig, os.path.join(match_dir, chart), formats)
+    return paths
+
+
+def _render_job(csv_file_path, player_info_csv, charts, formats, output_dir, trace=None):
+    """Render one match in a worker and return its spans when tracing."""
+    if trace is None:
+        return render_match(csv_file_path, player_info_csv, charts, formats, output_dir), None
+    ins.reset()
+    ins.enable(trace_memory=trace == "memory")
+    with ins.span("render_match", match=os.path.basename(csv_file_path)):
+        paths = render_match(csv_file_path, player_info_csv, charts, formats, output_dir)
+    return paths, ins.collect()
+
+
+def load_render_cache(output_dir):
+    path = os.path.join(output_dir, RENDER_CACHE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_render_cache(output_dir, cache):
+    with open(os.path.join(output_dir, RENDER_CACHE_FILE), "w") as file:
+        json.dump(cache, file, indent=2, sort_keys=True)
+
+
+def is_cached(entry, digest, charts, formats):
+    """Check whether a match was already rendered from the same file contents."""
+    return (
+        entry is not None
+        and entry["hash"] == digest
+        and set(charts) <= set(entry["charts"])
+        and set(formats) <= set(entry["formats"])
+    )
+
+
+def render_all(
+    data_dir, charts, formats, output_dir, player_info_csv, workers=None, force=False, trace=None
+):
+    """Render every match in a directory across a process pool, skipping unchanged matches.
+
+    trace is None, "time" or "memory"; worker spans are merged into this process.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache = {} if force else load_render_cache(output_dir)
+
+    jobs = {}
+    skipped = 0
+    for path in Season(data_dir).match_files():
+        name = os.path.basename(path)
+        digest = file_hash(path)
+        if is_cached(cache.get(name), digest, charts, formats):
+            skipped += 1
+            continue
+        jobs[name] = (path, digest)
+
+    print(f"Rendering {len(jobs)} matches, skipping {skipped} unchanged.")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                _render_job, path, player_info_csv, charts, formats, output_dir, trace
+            ): name
+            for name, (path, _) in jobs.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                paths, records = future.result()
+            except Exception as error:
+                print(f"Error: Could not render '{name}': {error}")
+                continue
+            if records is not None:
+                ins.merge(records)
+            if not paths:
+                # Nothing was written, so try the match again on the next run
+                print(f"Error: No charts were rendered for '{name}'.")
+                continue
+            digest = jobs[name][1]
+            entry = cache.get(name)
+            if entry is None or entry["hash"] != digest:
+                entry = {"hash": digest, "charts": [], "formats": []}
+            # Keep earlier outputs of the same file contents
+            entry["charts"] = sorted(set(entry["charts"]) | set(charts))
+            entry["formats"] = sorted(set(entry["formats"]) | set(formats))
+            cache[name] = entry
+
+    save_render_cache(output_dir, cache)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export CricStat charts for a directory of matches.")
+    parser.add_argument("data_dir", help="directory containing the match files (CSV, Parquet or Feather)")
+    parser.add_argument(
+        "--charts",
+        nargs="+",
+        choices=sorted(CHART_TYPES),
+        default=sorted(CHART_TYPES),
+        help="chart types to render",
+    )
+    parser.add_argument(
+        "--formats", nargs="+", choices=FORMATS, default=["html"], help="output formats"
+    )
+    parser.add_argument("--output-dir", default="output", help="where to write the charts")
+    parser.add_argument(
+        "--player-info",
+        default=os.path.join("data", "playerdata.csv"),
+        help="player information CSV",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--force", action="store_true", help="ignore the render cache")
+    parser.add_argument(
+        "--trace",
+        help="write stage timings to this file (Chrome trace format if it ends in .trace.json)",
+    )
+    parser.add_argument(
+        "--trace-memory", action="store_true", help="also record peak allocations per stage"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    render_all(
+        args.data_dir,
+        args.charts,
+        args.formats,
+        args.output_dir,
+        args.player_info,
+        workers=args.workers,
+        force=args.force,
+        trace=("memory" if args.trace_memory else "time") if args.trace else None,
+    )
+    if args.trace:
+        ins.export(args.trace)
+
 
 if __name__ == "__main__":
     main()
@@ -1,71 +1,124 @@
-import pandas as pd
-import plotly.express as px
+import aggregations
+import instrumentation as ins
+import kernels
+import phases as ph
 import plotting_utils as pu
-import plotly.graph_objects as go
+import preprocessing
+import storage
+import winprob
 from color_scheme import ColorScheme
+from lazy import lazy_import
+from players import PlayerIndex
+
+# Plotting libraries load on the first plot, so data-only use never imports them
+pd = lazy_import("pandas")
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
 
 
 class Match:
-    def __init__(self, csv_file_path, player_info_csv):
+    def __init__(self, csv_file_path, player_info_csv, match_format=ph.DEFAULT_FORMAT):
         self.csv_file_path = csv_file_path
         self.player_info_csv = player_info_csv
+        self.match_format = match_format
+        if match_format not in ph.PHASE_DEFINITIONS:
+            # Every phase, plot and summary depends on the format, so there is nothing to fall back to
+            raise ValueError(
+                f"Unknown match format '{match_format}'; expected one of {', '.join(ph.PHASE_DEFINITIONS)}."
+            )
+        self.phases = ph.get_phases(match_format)
+        self.over_types = ph.over_types(self.phases)
         self.df = None
         self.player_info_df = None
+        self.players = None
         self.primary_colors = None
         self.primary_color = None
         self.secondary_colors = None
         self.secondary_color = None
         self.team = None
-
-    def read_csv(self):
+        # Derived tables, keyed by the data version they were computed from
+        self._cache = {}
+        self._data_version = 0
+
+    def invalidate_cache(self):
+        """Drop every derived table after the underlying data changed."""
+        self._data_version += 1
+        self._cache = {}
+
+    def _cached(self, key, compute):
+        """Return a derived table, computing it once per data version."""
+        key = (self._data_version,) + key
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @ins.traced("match.read_csv")
+    def read_csv(self, columns=None):
         """Read the CSV file and load the data into a pandas DataFrame."""
         try:
-            self.df = pd.read_csv(self.csv_file_path)
+            self.df = storage.read_match(self.csv_file_path, columns)
+            ins.count("rows_read", len(self.df))
         except FileNotFoundError:
             print(f"Error: File '{self.csv_file_path}' not found.")
             self.df = None
+        self.invalidate_cache()
 
+    @ins.traced("match.read_player_info_csv")
     def read_player_info_csv(self):
         """Read the player information CSV file."""
         try:
             self.player_info_df = pd.read_csv(self.player_info_csv)
+            self.players = PlayerIndex(self.player_info_df)
         except FileNotFoundError:
             print(f"Error: File '{self.player_info_csv}' not found.")
             self.player_info_df = None
+            self.players = None
+
+    @ins.traced("match.enrich_player_data")
+    def enrich_player_data(self):
+        """Join batter and bowler attributes from the player information onto the data."""
+        if self.df is None:
+            print("Error: DataFrame is empty. Please read CSV file first.")
+        elif self.players is None:
+            print("Error: Player information is empty. Please read player info CSV first.")
+        else:
+            self.df = self.players.enrich(self.df)
+            self.invalidate_cache()
 
+    @ins.traced("match.preprocess_data")
     def preprocess_data(self):
         """Preprocess the data as needed."""
         if self.df is not None:
-            # Convert overs to balls
-            def delivery_to_balls(delivery):
-                try:
-                    overs, balls = map(int, str(delivery).split("."))
-                    return overs * 6 + balls
-                except ValueError:
-                    return None
-
-            self.df["ball"] = self.df["delivery"].apply(delivery_to_balls)
-            # Convert 'res' column to numeric dtype
-            self.df["res"] = pd.to_numeric(self.df["res"], errors="coerce")
-
-            # Other preprocessing steps can be added here if needed
+            # Ball numbers, legal-ball numbering, phases and numeric 'res'
+            self.df = preprocessing.preprocess(self.df, self.phases)
+            ins.count("rows_preprocessed", len(self.df))
+            self.invalidate_cache()
 
         else:
             print("Error: DataFrame is empty. Please read CSV file first.")
 
+    def innings_df(self, inning):
+        """Return the deliveries of one innings."""
+        return self._cached(
+            ("innings", inning), lambda: self.df[self.df["innings"] == inning]
+        )
+
     def set_team_colors(self, team):
-        primary_colors, secondary_colors = ColorScheme.get_colors(team)
+        primary_colors, secondary_colors = self._cached(
+            ("colors", team), lambda: ColorScheme.get_colors(team)
+        )
         if primary_colors and secondary_colors:
             self.primary_color = primary_colors[0]
             self.secondary_color = secondary_colors[0]
         else:
             print(f"Error: Color scheme not found for team '{team}'.")
 
-    def plot_score_vs_delivery(self):
+    @ins.traced("match.plot_score_vs_delivery")
+    def plot_score_vs_delivery(self, show=True):
         if self.df is not None:
             # Split dataframe based on innings
-            innings_1 = self.df[self.df["innings"] == 1]
-            innings_2 = self.df[self.df["innings"] == 2]
+            innings_1 = self.innings_df(1)
+            innings_2 = self.innings_df(2)
 
             innings_1_powerplay = innings_1[innings_1["powerplay"] == 1]
             innings_2_powerplay = innings_2[innings_2["powerplay"] == 1]
@@ -81,27 +134,24 @@ class Match:
             self.set_team_colors(batting_team_2)
             primary_color_2 = self.primary_color
 
-            # Create a figure
-            fig = px.line(title="Score Progression - Innings 1 vs Innings 2")
-
-            # Add traces for each inning with filled areas under the curve
-            fig.add_scatter(
-                x=innings_1["ball"],
-                y=innings_1["score"],
-                mode="lines",
-                name=f"{batting_team_1} (Inning 1)",
-                line=dict(color=primary_color_1),
-                fill="tozeroy",
-            )
-            fig.add_scatter(
-                x=innings_2["ball"],
-                y=innings_2["score"],
-                mode="lines",
-                name=f"{batting_team_2} (Inning 2)",
-                line=dict(color=primary_color_2),
-                fill="tozeroy",
-            )
-            fig.add_trace(
+            # Traces for each inning with filled areas under the curve
+            traces = [
+                go.Scatter(
+                    x=innings_1["ball"],
+                    y=innings_1["score"],
+                    mode="lines",
+                    name=f"{batting_team_1} (Inning 1)",
+                    line=dict(color=primary_color_1),
+                    fill="tozeroy",
+                ),
+                go.Scatter(
+                    x=innings_2["ball"],
+                    y=innings_2["score"],
+                    mode="lines",
+                    name=f"{batting_team_2} (Inning 2)",
+                    line=dict(color=primary_color_2),
+                    fill="tozeroy",
+                ),
                 go.Scatter(
                     x=innings_1_powerplay["ball"],
                     y=innings_1_powerplay["score"],
@@ -111,9 +161,7 @@ class Match:
                     fill="tozeroy",
                     visible="legendonly",  # Initially hidden
                     showlegend=True,
-                )
-            )
-            fig.add_trace(
+                ),
                 go.Scatter(
                     x=innings_2_powerplay["ball"],
                     y=innings_2_powerplay["score"],
@@ -123,97 +171,212 @@ class Match:
                     fill="tozeroy",
                     visible="legendonly",  # Initially hidden
                     showlegend=True,
-                )
-            )
+                ),
+            ]
 
-            fig = pu.customize_plot_vs_score_plot(fig)
+            fig = pu.figure(
+                "cricstat_score", traces, title="Score Progression - Innings 1 vs Innings 2"
+            )
             # Show the plot
-            fig.show()
+            ins.count("traces_added", len(fig.data))
+            if show:
+                fig.show()
+            return fig
         else:
             print("Error: DataFrame is empty. Please read CSV file first.")
 
-    def calculate_run_rate(self, df=None, over_type=None):
+    def over_summary(self, df=None):
+        """Return the per-over summary table for the match."""
         if df is None:
-            df = self.df
+            return self._cached(("over_summary",), lambda: aggregations.over_summary(self.df))
+        return aggregations.over_summary(df)
 
-        run_rates_1 = []  # Run rates for innings 1
-        run_rates_2 = []  # Run rates for innings 2
+    @ins.traced("match.calculate_run_rate")
+    def calculate_run_rate(self, df=None, over_type=None):
+        summary = self.over_summary(df)
 
-        for inning in [1, 2]:
-            inning_df = df[df["innings"] == inning]
+        # Restrict to the overs of the requested phase
+        if over_type is not None:
+            if over_type not in self.over_types:
+                print("Invalid over type.")
+                return None
+            first_over, last_over = self.over_types[over_type]
+            summary = summary[summary["over"].between(first_over, last_over)]
 
-            # If over_type is not specified, calculate run rate inning-wise
-            if over_type is None:
-                initial_over = 0
-            else:
-                # Determine the initial value of the over based on the inning and over type
-                if inning == 1:
-                    initial_over = 0
-                else:
-                    # Adjust the initial over value based on the over type
-                    if over_type == "Powerplay":
-                        initial_over = 0
-                    elif over_type == "Middle Overs":
-                        initial_over = 6
-                    elif over_type == "Death Overs":
-                        initial_over = 15
-                    else:
-                        print("Invalid over type.")
-                        return None
-
-            # Initialize the over variable with the correct initial value
-            over = initial_over
-
-            for i in range(5, len(inning_df), 6):
-                over += 1
-                total_run = inning_df.iloc[i]["score"]
-                run_rate = round((total_run / over), 2)
-
-                if inning == 1:
-                    run_rates_1.append((over, run_rate))
-                else:
-                    run_rates_2.append((over, run_rate))
+        run_rates = []
+        for inning in [1, 2]:
+            inning_summary = summary[summary["innings"] == inning]
+            run_rates.append(
+                list(
+                    zip(
+                        inning_summary["over"].tolist(),
+                        inning_summary["run_rate"].tolist(),
+                    )
+                )
+            )
 
+        run_rates_1, run_rates_2 = run_rates
         return run_rates_1, run_rates_2
 
-
+    @ins.traced("match.number_of_wicket_fell_in_an_over")
     def number_of_wicket_fell_in_an_over(self):
-        wicket_inning_1 = []
-        wicket_inning_2 = []
+        summary = self.over_summary()
 
+        wickets = []
         for inning in [1, 2]:
-            inning_df = self.df[self.df["innings"] == inning]
-            over = 0
-            prev_wicket = 0
-            for i in range(5, len(inning_df), 6):
-                over += 1
-                currentWicket = inning_df.iloc[i]["wicketfell"] - prev_wicket
-                if inning == 1:
-                    wicket_inning_1.append((over, currentWicket))
-                else:
-                    wicket_inning_2.append((over, currentWicket))
-
-                prev_wicket = inning_df.iloc[i]["wicketfell"]
+            inning_summary = summary[summary["innings"] == inning]
+            wickets.append(
+                list(
+                    zip(
+                        inning_summary["over"].tolist(),
+                        inning_summary["wickets"].tolist(),
+                    )
+                )
+            )
 
+        wicket_inning_1, wicket_inning_2 = wickets
         return wicket_inning_1, wicket_inning_2
 
+    def dismissed_batters(self):
+        """Return the batters dismissed in each over, per innings."""
+        return self._cached(("dismissed_batters",), self._dismissed_batters)
+
+    def _dismissed_batters(self):
+        wickets = self.df[self.df["wicket"] > 0]
+        name_columns = [column for column in ["batterdismissed", "batters"] if column in wickets.columns]
+        if not name_columns:
+            # Columns were pruned on read, so the wickets keep their plain hover text
+            return {}, {}
+        # Fall back to the striker when the scorecard name is missing
+        names = wickets[name_columns[0]].astype(object)
+        for column in name_columns[1:]:
+            names = names.fillna(wickets[column].astype(object))
+
+        dismissed = []
+        for inning in [1, 2]:
+            in_inning = (wickets["innings"] == inning).to_numpy()
+            dismissed.append(
+                names[in_inning].groupby(wickets["over"][in_inning]).agg(list).to_dict()
+            )
+
+        dismissed_1, dismissed_2 = dismissed
+        return dismissed_1, dismissed_2
+
+    def phase_index(self):
+        """Return the row range of every (innings, phase) of the match."""
+
+        def build():
+            if "legal_ball" not in self.df.columns:
+                # Data has not been preprocessed; a delivery carries the number of its legal ball
+                legal_ball = preprocessing._delivery_to_balls(self.df["delivery"]).to_numpy()
+                return ph.phase_index(self.df.assign(legal_ball=legal_ball), self.phases)
+            return ph.phase_index(self.df, self.phases)
+
+        return self._cached(("phase_index",), build)
+
+    def phase_slice(self, inning, over_type):
+        """Return the deliveries of one phase of an innings without copying."""
+        start, stop = self.phase_index().get((inning, over_type), (0, 0))
+        return self.df.iloc[start:stop]
+
     def type_of_over(self, over_type):
-        if over_type == "Powerplay":
-            condition = (self.df["over"] > 0) & (self.df["over"] < 7)
-        elif over_type == "Middle Overs":
-            condition = (self.df["over"] > 6) & (self.df["over"] < 16)
-        elif over_type == "Death Overs":
-            condition = (self.df["over"] > 15) & (self.df["over"] < 21)
-        else:
+        if over_type not in self.phases:
             print("Invalid over type.")
             return None
 
-        return self.df[condition]
+        def phase_rows():
+            if "legal_ball" not in self.df.columns:
+                # Data has not been preprocessed, so select by over
+                first_over, last_over = self.over_types[over_type]
+                return self.df[self.df["over"].between(first_over, last_over)]
+            return pd.concat(
+                [
+                    self.phase_slice(inning, over_type)
+                    for inning in self.df["innings"].unique().tolist()
+                ]
+            )
+
+        return self._cached(("type_of_over", over_type), phase_rows)
+
+    @ins.traced("match.streaks")
+    def streaks(self, window=kernels.DEFAULT_WINDOW):
+        """Return balls since boundary and wicket, dot streaks and run rates around events per delivery."""
+        return self._cached(("streaks", window), lambda: kernels.derived_columns(self.df, window))
+
+    @ins.traced("match.win_probability")
+    def win_probability(self, model):
+        """Return the deliveries with the projected score and win probability after each ball.
+
+        model is a winprob.WinProbabilityModel, usually fitted on the season.
+        """
+        if self.df is None:
+            print("Error: DataFrame is empty. Please read CSV file first.")
+            return None
+        # The key holds the model itself, so its identity cannot be reused by another model
+        return self._cached(
+            ("win_probability", model), lambda: model.score(self.df, self.match_format)
+        )
+
+    def turning_points(self, model, count=3):
+        """Return the overs with the largest swings in win probability."""
+        scored = self.win_probability(model)
+        if scored is None:
+            return None
+        return winprob.turning_points(scored, count, model.start_probability())
+
+    def similar_innings(self, index, inning, k=5):
+        """Return the k innings of a season whose progression is most like one innings of this match.
+
+        index is a similarity.SimilarityIndex, usually SimilarityIndex.for_season.
+        """
+        if self.df is None:
+            print("Error: DataFrame is empty. Please read CSV file first.")
+            return None
+        rows, vectors = index.encode(self.df)
+        positions = rows.index[rows["innings"] == inning]
+        if not len(positions):
+            print(f"Error: Innings {inning} not found.")
+            return None
+        matchid = int(rows.loc[positions[0], "matchid"])
+        return index.nearest(vectors[positions[0]], k, exclude=(matchid, inning))
+
+    @ins.traced("match.phase_summary")
+    def phase_summary(self):
+        """Return runs, balls, dots, boundaries and wickets for each phase of each innings."""
+        return self._cached(("phase_summary",), self._phase_summary)
+
+    def _phase_summary(self):
+        rows = []
+        for (inning, over_type), (start, stop) in self.phase_index().items():
+            deliveries = self.df.iloc[start:stop]
+            if "legal" in deliveries.columns:
+                legal = deliveries["legal"]
+            else:
+                # Data has not been preprocessed, so find the legal balls from the raw rows
+                legal = aggregations.legal_ball_mask(deliveries)
+            balls = int(legal.sum())
+            runs = int(deliveries["total"].sum())
+            batter_runs = int(deliveries["batterrun"].sum())
+            rows.append(
+                {
+                    "innings": inning,
+                    "phase": over_type,
+                    "runs": runs,
+                    "balls": balls,
+                    "wickets": int(deliveries["wicket"].sum()),
+                    "dots": int((legal & (deliveries["total"] == 0)).sum()),
+                    "boundaries": int(deliveries["batterrun"].isin([4, 6]).sum()),
+                    "run_rate": round(runs * 6 / balls, 2) if balls else 0,
+                    "strike_rate": round(batter_runs * 100 / balls, 2) if balls else 0,
+                }
+            )
+        return pd.DataFrame(rows)
 
-    def plot_run_rate(self):
+    @ins.traced("match.plot_run_rate")
+    def plot_run_rate(self, show=True):
         if self.df is not None:
-            innings_1 = self.df[self.df["innings"] == 1]
-            innings_2 = self.df[self.df["innings"] == 2]
+            innings_1 = self.innings_df(1)
+            innings_2 = self.innings_df(2)
 
             # Calculate run rates for each innings
             run_rates_1, run_rates_2 = self.calculate_run_rate()
@@ -227,37 +390,45 @@ class Match:
             batting_team_2 = innings_2["battingteam"].iloc[0]
 
             # Plot run rate over time for each innings
-            fig = px.line(title="Run Rate Over Time - Innings 1 vs Innings 2")
-
-            fig.add_scatter(
-                x=overs_1,
-                y=runs_1,
-                mode="lines",
-                name=f"{batting_team_1} (Inning 1)",
-                line=dict(color="#1f77b4"),
-            )
-            fig.add_scatter(
-                x=overs_2,
-                y=runs_2,
-                mode="lines",
-                name=f"{batting_team_2} (Inning 2)",
-                line=dict(color="#ff7f0e"),
+            traces = [
+                go.Scatter(
+                    x=overs_1,
+                    y=runs_1,
+                    mode="lines",
+                    name=f"{batting_team_1} (Inning 1)",
+                    line=dict(color="#1f77b4"),
+                ),
+                go.Scatter(
+                    x=overs_2,
+                    y=runs_2,
+                    mode="lines",
+                    name=f"{batting_team_2} (Inning 2)",
+                    line=dict(color="#ff7f0e"),
+                ),
+            ]
+            traces += pu.wicket_traces(
+                self.number_of_wicket_fell_in_an_over(),
+                run_rates_1,
+                run_rates_2,
+                dismissed_batters=self.dismissed_batters(),
             )
 
-            # # Customize the plot
-            fig = pu.customize_run_rate_plot(fig)
-            fig = pu.add_wicket_circles(
-                fig, self.number_of_wicket_fell_in_an_over(), *self.calculate_run_rate()
+            fig = pu.figure(
+                "cricstat_run_rate", traces, title="Run Rate Over Time - Innings 1 vs Innings 2"
             )
-            fig.show()
+            ins.count("traces_added", len(fig.data))
+            if show:
+                fig.show()
+            return fig
 
         else:
             print("Error: DataFrame is empty. Please read CSV file first.")
 
-    def plot_run_rate_bar_chart(self):
+    @ins.traced("match.plot_run_rate_bar_chart")
+    def plot_run_rate_bar_chart(self, show=True):
         if self.df is not None:
-            innings_1 = self.df[self.df["innings"] == 1]
-            innings_2 = self.df[self.df["innings"] == 2]
+            innings_1 = self.innings_df(1)
+            innings_2 = self.innings_df(2)
 
             # Get batting team names for both innings
             batting_team_1 = innings_1["battingteam"].iloc[0]
@@ -276,26 +447,25 @@ class Match:
             overs_1, runs_1 = zip(*overall_run_rates_1)
             overs_2, runs_2 = zip(*overall_run_rates_2)
 
-            # Create a bar chart for run rate over time
-            fig = go.Figure()
-            timeout_overs = self.df.loc[
-                self.df["strategictimeout"] == 1, "over"
-            ].tolist()
-
-            for over in timeout_overs:
-                fig.add_trace(
-                    go.Scatter(
-                        x=[over, over],
-                        y=[0, 36],
-                        mode="lines",
-                        name=f"Strategic Timeout - Over {over}",
-                        line=dict(color="red", width=1, dash="dash"),
-                        visible="legendonly",  # Initially hidden
-                    )
-                )
+            # Traces of the bar chart for run rate over time
+            traces = []
+            timeout_overs = sorted(
+                set(self.df.loc[self.df["strategictimeout"] == 1, "over"].tolist())
+            )
+
+            timeout_lines = pu.vertical_lines(
+                timeout_overs,
+                (0, 36),
+                "Strategic Timeout",
+                line=dict(color="red", width=1, dash="dash"),
+                text=[f"Strategic Timeout - Over {over}" for over in timeout_overs],
+                visible="legendonly",  # Initially hidden
+            )
+            if timeout_lines is not None:
+                traces.append(timeout_lines)
 
             # Add bar traces for overall run rate
-            fig.add_trace(
+            traces.append(
                 go.Bar(
                     x=overs_1,
                     y=runs_1,
@@ -304,7 +474,7 @@ class Match:
                     visible="legendonly",  # Initially hidden
                 )
             )
-            fig.add_trace(
+            traces.append(
                 go.Bar(
                     x=overs_2,
                     y=runs_2,
@@ -314,19 +484,19 @@ class Match:
                 )
             )
 
-            over_types = ["Powerplay", "Middle Overs", "Death Overs"]
-            for over_type in over_types:
-                run_rate_df = self.type_of_over(over_type)
-                if run_rate_df is not None:
-                    # Calculate run rates for the current over type
-                    run_rates_1_type, run_rates_2_type = self.calculate_run_rate(df=run_rate_df, over_type=over_type)
+            for over_type in self.phases:
+                run_rates_type = self.calculate_run_rate(over_type=over_type)
+                if run_rates_type is not None:
+                    # Run rates for the current over type
+                    run_rates_1_type, run_rates_2_type = run_rates_type
 
                     # Extract overs and runs for each innings for the current over type
-                    overs_1_type, runs_1_type = zip(*run_rates_1_type)
-                    overs_2_type, runs_2_type = zip(*run_rates_2_type)
+                    # (a chase can end before the phase starts)
+                    overs_1_type, runs_1_type = zip(*run_rates_1_type) if run_rates_1_type else ((), ())
+                    overs_2_type, runs_2_type = zip(*run_rates_2_type) if run_rates_2_type else ((), ())
 
                     # Add bar traces for the current over type
-                    fig.add_trace(
+                    traces.append(
                         go.Bar(
                             x=overs_1_type,
                             y=runs_1_type,
@@ -335,7 +505,7 @@ class Match:
                             visible="legendonly",  # Initially hidden
                         )
                     )
-                    fig.add_trace(
+                    traces.append(
                         go.Bar(
                             x=overs_2_type,
                             y=runs_2_type,
@@ -345,15 +515,24 @@ class Match:
                         )
                     )
 
-            fig = pu.customize_bar_chart(fig, 20)
-
-            fig.update_yaxes()
-            fig.show()
+            # Tick labels show every over of the format
+            last_over = max(last for _, last in self.over_types.values())
+            fig = pu.figure(
+                "cricstat_bar",
+                traces,
+                title="<b>Run Rate Over Time - Innings 1 vs Innings 2</b>",
+                xaxis_tickvals=list(range(1, last_over + 1)),
+            )
+            ins.count("traces_added", len(fig.data))
+            if show:
+                fig.show()
+            return fig
         else:
             print("Error: DataFrame is empty. Please read CSV file first.")
 
 
-    def plot_scatter_chart(self):
+    @ins.traced("match.plot_scatter_chart")
+    def plot_scatter_chart(self, show=True):
         if self.df is not None:
             df_res_0 = self.df[self.df["res"] == 0]
 
@@ -382,7 +561,10 @@ class Match:
             # Set y-axis tick mode and initial tick value
             fig.update_yaxes(tickmode="linear", tick0=0, dtick=1)
 
-            fig.show()
+            ins.count("traces_added", len(fig.data))
+            if show:
+                fig.show()
+            return fig
         else:
             print("Error: DataFrame is empty. Please read CSV file first.")
 
@@ -0,0 +1,94 @@
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# First and last legal ball (inclusive) of each phase of an innings, per match format
+PHASE_DEFINITIONS = {
+    "T20": {
+        "Powerplay": (1, 36),
+        "Middle Overs": (37, 90),
+        "Death Overs": (91, 120),
+    },
+    "T10": {
+        "Powerplay": (1, 18),
+        "Middle Overs": (19, 42),
+        "Death Overs": (43, 60),
+    },
+    "The Hundred": {
+        "Powerplay": (1, 25),
+        "Middle Overs": (26, 75),
+        "Death Overs": (76, 100),
+    },
+}
+
+DEFAULT_FORMAT = "T20"
+
+BALLS_PER_OVER = 6
+
+
+def get_phases(match_format):
+    """Return the phase definition of a match format."""
+    phases = PHASE_DEFINITIONS.get(match_format)
+    if phases is None:
+        print(f"Error: Phase definition not found for format '{match_format}'.")
+    return phases
+
+
+def over_types(phases):
+    """Return the first and last over of each phase, by the phase of an over's first ball."""
+    bounds = {}
+    for name, (first_ball, last_ball) in phases.items():
+        first_over = (first_ball - 1) // BALLS_PER_OVER + 1
+        if (first_ball - 1) % BALLS_PER_OVER:
+            first_over += 1
+        last_over = (last_ball - 1) // BALLS_PER_OVER + 1
+        bounds[name] = (first_over, last_over)
+    return bounds
+
+
+def phase_labels(legal_ball, phases):
+    """Label each delivery with its phase from its legal-ball number."""
+    names = list(phases)
+    bins = [phases[names[0]][0] - 1] + [phases[name][1] for name in names]
+    return pd.cut(legal_ball, bins=bins, labels=names)
+
+
+def phase_of_ball(phases):
+    """Return a list mapping each legal-ball number to its phase."""
+    last_ball = max(last for _, last in phases.values())
+    lookup = [None] * (last_ball + 1)
+    for name, (first_ball, last_ball) in phases.items():
+        for ball in range(first_ball, last_ball + 1):
+            lookup[ball] = name
+    return lookup
+
+
+def phase_index(df, phases, keys=("innings",)):
+    """Return the (start, stop) row offsets of every phase of every innings.
+
+    Rows must be grouped by the key columns and ordered by legal ball within
+    each group, as written by the extractor. The result maps
+    ``(*key values, phase)`` to a row range usable with ``df.iloc[start:stop]``.
+    """
+    keys = list(keys)
+    index = {}
+    if df.empty:
+        return index
+
+    # Row offsets where any key column changes value
+    group_values = df[keys].to_numpy()
+    changes = np.flatnonzero((group_values[1:] != group_values[:-1]).any(axis=1)) + 1
+    starts = np.concatenate(([0], changes))
+    stops = np.concatenate((changes, [len(df)]))
+
+    legal_ball = df["legal_ball"].to_numpy()
+    for start, stop in zip(starts, stops):
+        balls = legal_ball[start:stop]
+        group = tuple(group_values[start].tolist())
+        for name, (first_ball, last_ball) in phases.items():
+            first = start + np.searchsorted(balls, first_ball, side="left")
+            last = start + np.searchsorted(balls, last_ball, side="right")
+            index[group + (name,)] = (int(first), int(last))
+
+    return index
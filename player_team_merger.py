@@ -1,32 +1,64 @@
-import pandas as pd
+import argparse
+import os
 
-# Assuming all CSV files are in the same directory
-input_file = "C:\\Users\\sufiy\\OneDrive\\Desktop\\Projects\\CricStat\\data\\modified_merged_player_data.csv"
-output_file = "C:\\Users\\sufiy\\OneDrive\\Desktop\\Projects\\CricStat\\data\\playerdata.csv"
+from lazy import lazy_import
 
-# Read the CSV file with default settings
-merged_df = pd.read_csv(input_file)
+pd = lazy_import("pandas")
 
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 
+# Source columns to keep and their names in the player information file
+COLUMN_NAMES = {
+    "Player Name": "player",
+    "Batting Hand": "battinghand",
+    "Bowling Hand": "bowlinghand",
+    "Bowling Type": "bowlingtype",
+    "Nationality": "nationality",
+    "Team Acronym": "team",
+}
 
-# Print the columns of the DataFrame to confirm proper parsing
-print("Columns in DataFrame:", merged_df.columns)
 
-# Rename the columns
-merged_df = merged_df.rename(
-    columns={
-        "Player Name": "player",
-        "Team Acronym": "team",
-        "Batting Hand": "battinghand",
-        "Bowling Hand": "bowlinghand",
-        "Bowling Type": "bowlingtype",
-        "Nationality": "nationality",
-    }
-)
+def build_player_data(input_file):
+    """Read the merged squad list and return one row per player with the kept columns."""
+    # Read only the kept columns and rename them in one step
+    merged_df = pd.read_csv(input_file, usecols=list(COLUMN_NAMES)).rename(columns=COLUMN_NAMES)
+    merged_df = merged_df[list(COLUMN_NAMES.values())]
 
-merged_df = merged_df.drop(columns= ['Team Name'])
+    # A player listed twice would match twice when joined onto the deliveries
+    duplicates = merged_df["player"].duplicated()
+    if duplicates.any():
+        print(f"Error: Dropping {int(duplicates.sum())} repeated players: {', '.join(merged_df.loc[duplicates, 'player'])}")
+    return merged_df[~duplicates]
 
-# Write the modified DataFrame to a new CSV file
-merged_df.to_csv(output_file, index=False)
 
-print("Modified merged data saved to:", output_file)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the player information CSV from the merged squad list.")
+    parser.add_argument(
+        "--input",
+        default=os.path.join(DATA_DIR, "modified_merged_player_data.csv"),
+        help="merged squad list with team acronyms",
+    )
+    parser.add_argument(
+        "--output",
+        default=os.path.join(DATA_DIR, "playerdata.csv"),
+        help="player information CSV to write",
+    )
+    args = parser.parse_args(argv)
+
+    merged_df = build_player_data(args.input)
+    content = merged_df.to_csv(index=False)
+
+    # Leave an identical file untouched, so its hash and modification time stay the same
+    if os.path.exists(args.output):
+        with open(args.output, newline="") as file:
+            if file.read() == content:
+                print("Player data is already up to date:", args.output)
+                return
+
+    with open(args.output, "w", newline="") as file:
+        file.write(content)
+    print("Modified merged data saved to:", args.output)
+
+
+if __name__ == "__main__":
+    main()
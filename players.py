@@ -0,0 +1,132 @@
+import re
+import unicodedata
+
+from aggregations import legal_ball_mask
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Columns of data/playerdata.csv describing each player
+PLAYER_ATTRIBUTES = ["battinghand", "bowlinghand", "bowlingtype", "nationality", "team"]
+
+
+def normalize_name(name):
+    """Normalise a player name so scraped and squad-list spellings compare equal."""
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    # Hyphens, dots and apostrophes become word breaks
+    name = re.sub(r"[^\w\s]", " ", name.casefold())
+    return " ".join(name.split())
+
+
+def _initial_key(normalized):
+    """Return (first initial, surname), e.g. 'Nat Sciver-Brunt' -> ('n', 'brunt')."""
+    parts = normalized.split()
+    if len(parts) < 2:
+        return None
+    return parts[0][0], parts[-1]
+
+
+class PlayerIndex:
+    """Intern player names to integer IDs and look up their attributes."""
+
+    def __init__(self, player_info_df):
+        self.players = player_info_df.reset_index(drop=True)
+        self.ids = {}
+
+        initials = {}
+        for player_id, name in enumerate(self.players["player"].tolist()):
+            key = normalize_name(name)
+            self.ids.setdefault(key, player_id)
+            initials.setdefault(_initial_key(key), []).append(player_id)
+
+        # Shortened first names only resolve when the surname is unambiguous
+        self.initials = {
+            key: ids[0] for key, ids in initials.items() if key is not None and len(ids) == 1
+        }
+
+        self.attributes = {
+            column: self.players[column].astype("category")
+            for column in PLAYER_ATTRIBUTES
+            if column in self.players.columns
+        }
+
+    @classmethod
+    def from_csv(cls, path):
+        """Build the index from a player information CSV."""
+        return cls(pd.read_csv(path, dtype=str))
+
+    def player_id(self, name):
+        """Return the ID of a player, or -1 when the name is unknown."""
+        key = normalize_name(name)
+        if key in self.ids:
+            return self.ids[key]
+        return self.initials.get(_initial_key(key), -1)
+
+    def player_ids(self, names):
+        """Map a column of names to player IDs, resolving each distinct name once."""
+        if not isinstance(names.dtype, pd.CategoricalDtype):
+            names = names.astype("category")
+
+        lookup = np.array(
+            [self.player_id(name) for name in names.cat.categories], dtype=np.int32
+        )
+        codes = names.cat.codes.to_numpy()
+        ids = np.full(len(codes), -1, dtype=np.int32)
+        known = codes >= 0
+        ids[known] = lookup[codes[known]]
+        return pd.Series(ids, index=names.index)
+
+    def attribute(self, ids, column):
+        """Look up one attribute for an array of player IDs."""
+        values = self.attributes[column]
+        attribute_codes = values.cat.codes.to_numpy()
+
+        ids = np.asarray(ids)
+        codes = np.full(len(ids), -1, dtype=attribute_codes.dtype)
+        known = ids >= 0
+        codes[known] = attribute_codes[ids[known]]
+        return pd.Categorical.from_codes(codes, categories=values.cat.categories)
+
+    def enrich(self, df):
+        """Add player IDs, handedness, bowling type and nationality to ball-by-ball data."""
+        batter_ids = self.player_ids(df["batters"])
+        bowler_ids = self.player_ids(df["bowlers"])
+        df["batter_id"] = batter_ids
+        df["bowler_id"] = bowler_ids
+
+        columns = {
+            "battinghand": ("battinghand", batter_ids),
+            "batter_nationality": ("nationality", batter_ids),
+            "bowlinghand": ("bowlinghand", bowler_ids),
+            "bowlingtype": ("bowlingtype", bowler_ids),
+            "bowler_nationality": ("nationality", bowler_ids),
+        }
+        for name, (column, ids) in columns.items():
+            if column in self.attributes:
+                df[name] = self.attribute(ids.to_numpy(), column)
+
+        return df
+
+
+def bowling_type_summary(df, by=("bowlinghand", "bowlingtype")):
+    """Summarise runs, balls, dots and wickets by bowler type for enriched data."""
+    legal = df["legal"] if "legal" in df.columns else legal_ball_mask(df)
+    wickets = df["bowlerwicket"] if "bowlerwicket" in df.columns else df["wicket"]
+    balls = pd.DataFrame(
+        {
+            **{column: df[column] for column in by},
+            "runs": df["total"].astype("int32"),
+            "balls": legal.astype("int32"),
+            "dots": (legal & (df["total"] == 0)).astype("int32"),
+            "wickets": wickets.astype("int32"),
+        }
+    )
+
+    summary = balls.groupby(list(by), observed=True).sum().reset_index()
+    summary["economy"] = (summary["runs"] * 6 / summary["balls"].where(summary["balls"] > 0)).round(2)
+    summary["balls_per_wicket"] = (
+        summary["balls"] / summary["wickets"].where(summary["wickets"] > 0)
+    ).round(2)
+    return summary
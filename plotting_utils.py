@@ -1,51 +1,266 @@
-import plotly.graph_objects as go
-
-def customize_run_rate_plot(fig):
-    """Customize the appearance of the run rate plot."""
-    fig.update_layout(
-        xaxis_title="<b>Over</b>",
-        yaxis_title="<b>Run Rate (Runs per Over)</b>",
-        font=dict(family="Arial, sans-serif", size=12, color="black"),
-        plot_bgcolor="rgba(255,255,255,0.9)",
-        paper_bgcolor="rgba(255,255,255,0.9)",
-        hovermode="x unified",
-        hoverlabel=dict(bgcolor="white", font_size=12, font_family="Arial, sans-serif"),
-        legend=dict(
-            title="<b>Innings</b>",
-            font=dict(family="Arial, sans-serif", size=12, color="black"),
-            bgcolor="rgba(255,255,255,0.9)",
-            itemsizing="constant",
+import json
+
+import instrumentation as ins
+from color_scheme import ColorScheme
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+go = lazy_import("plotly.graph_objects")
+pio = lazy_import("plotly.io")
+
+FONT = dict(family="Arial, sans-serif", size=12, color="black")
+HOVER_LABEL = dict(bgcolor="white", font_size=12, font_family="Arial, sans-serif")
+INNINGS_LEGEND = dict(
+    title="<b>Innings</b>",
+    font=FONT,
+    bgcolor="rgba(255,255,255,0.9)",
+    itemsizing="constant",
+)
+
+# Chart styles, registered once as Plotly templates and referenced by name from each figure
+TEMPLATES = {
+    "cricstat_run_rate": dict(
+        layout=dict(
+            xaxis_title="<b>Over</b>",
+            yaxis_title="<b>Run Rate (Runs per Over)</b>",
+            font=FONT,
+            plot_bgcolor="rgba(255,255,255,0.9)",
+            paper_bgcolor="rgba(255,255,255,0.9)",
+            hovermode="x unified",
+            hoverlabel=HOVER_LABEL,
+            legend=INNINGS_LEGEND,
+            transition_duration=500,
+        ),
+        data=dict(scatter=[dict(marker=dict(size=8, opacity=0.9), line=dict(width=3))]),
+    ),
+    "cricstat_bar": dict(
+        layout=dict(
+            xaxis=dict(title="<b>Over</b>", tickmode="array", tickfont=dict(size=12, color="black")),
+            yaxis_title="<b>Run Rate</b>",
+            font=dict(FONT, size=14),
+            plot_bgcolor="rgba(240, 240, 240, 0.9)",  # Light gray background
+            paper_bgcolor="rgba(240, 240, 240, 0.9)",
+            hovermode="x unified",
+            hoverlabel=HOVER_LABEL,
+            legend=INNINGS_LEGEND,
+            barmode="group",
+            bargap=0.1,
+            bargroupgap=0.1,
+            transition_duration=500,
+        ),
+        data=dict(bar=[dict(marker=dict(opacity=0.9))]),
+    ),
+    "cricstat_score": dict(
+        layout=dict(
+            xaxis_title="<b>Delivery</b>",
+            yaxis_title="<b>Score</b>",
+            font=FONT,
+            plot_bgcolor="rgba(255,255,255,0.9)",
+            paper_bgcolor="rgba(255,255,255,0.9)",
+            hovermode="x unified",
+            hoverlabel=HOVER_LABEL,
+            legend=INNINGS_LEGEND,
+            transition_duration=500,
+            # Unnamed template annotations are drawn on every figure using the template
+            annotations=[
+                dict(
+                    x=60,
+                    y=100,
+                    text="Halfway Mark",
+                    showarrow=True,
+                    arrowhead=1,
+                    ax=30,
+                    ay=-30,
+                    font=dict(color="black", size=12),
+                )
+            ],
+        ),
+        data=dict(
+            scatter=[
+                dict(
+                    marker=dict(size=8, opacity=0.9),
+                    line=dict(width=3),
+                    hovertemplate="Delivery: %{x}<br>Score: %{y}<br>",
+                )
+            ]
         ),
+    ),
+    "cricstat_worm": dict(
+        layout=dict(
+            xaxis_title="<b>Legal Ball</b>",
+            yaxis_title="<b>Score</b>",
+            font=FONT,
+            plot_bgcolor="rgba(255,255,255,0.9)",
+            paper_bgcolor="rgba(255,255,255,0.9)",
+            hovermode="closest",
+            legend=dict(title="<b>Team</b>", itemsizing="constant"),
+        ),
+    ),
+}
+
+# Team primary colours, filled in once by register_templates
+TEAM_COLORS = {}
+
+_registered = False
+
+
+def register_templates():
+    """Register the CricStat templates with Plotly, once per process.
+
+    Each template starts from Plotly's default look, so a figure only needs
+    its data and the template name. The team colours of ColorScheme become
+    the colorway, so traces without an explicit colour still use them.
+    """
+    global _registered
+    if _registered:
+        return
+    for team in ColorScheme.COLOR_SCHEMES:
+        primary_colors, _ = ColorScheme.get_colors(team)
+        if primary_colors:
+            TEAM_COLORS[team] = primary_colors[0]
+    for name, style in TEMPLATES.items():
+        template = go.layout.Template(pio.templates["plotly"])
+        template.update(style)
+        template.layout.colorway = list(TEAM_COLORS.values())
+        pio.templates[name] = template
+    _registered = True
+
+
+def team_color(team):
+    """Return a team's primary colour, or None for a team without a colour scheme."""
+    register_templates()
+    return TEAM_COLORS.get(team)
+
+
+@ins.traced("plotting_utils.figure")
+def figure(template, data, **layout):
+    """Build a figure from its traces in one step, styled by a registered template."""
+    register_templates()
+    # meta records the template name, so figure_json can send the name instead of the styles
+    return go.Figure(
+        data=data, layout=dict(layout, template=pio.templates[template], meta=dict(template=template))
     )
 
-    # Add subtle animation
-    fig.update_layout(transition_duration=500)
 
-    # Update marker and line properties for enhanced appearance
-    fig.update_traces(marker=dict(size=8, opacity=0.9), line=dict(width=3))
+def figure_json(fig, inline_template=False):
+    """Serialize a figure as Plotly JSON with its template replaced by the template's name.
+
+    The styles of a registered template are sent once (see template_json)
+    instead of being repeated in every figure; the reader puts the template
+    back with merge_template before drawing. inline_template=True keeps the
+    styles in the JSON, so it is standalone.
+    """
+    if inline_template:
+        return fig.to_json()
+    fig_dict = fig.to_dict()
+    name = (fig_dict["layout"].get("meta") or {}).get("template")
+    if name in TEMPLATES:
+        fig_dict["layout"]["template"] = name
+    return pio.to_json(fig_dict, validate=False)
+
+
+def template_json(name):
+    """Return a registered template as Plotly JSON, or None for an unknown name."""
+    if name not in TEMPLATES:
+        return None
+    register_templates()
+    return json.dumps(pio.templates[name].to_plotly_json())
+
+
+def merge_template(fig_dict):
+    """Replace a template name in a figure dict (from figure_json) by the registered template."""
+    layout = fig_dict.get("layout", {})
+    name = layout.get("template")
+    if isinstance(name, str) and name in TEMPLATES:
+        layout["template"] = json.loads(template_json(name))
+    return fig_dict
 
-    return fig
 
-def add_wicket_circles(fig, wicket_info, run_rates_1, run_rates_2):
-    """Add circles representing fall of wickets to the plot."""
+def _wicket_markers(wickets_inning, run_rates, dismissed_batters=None):
+    """Return marker coordinates and hover text for the wickets of one innings."""
+    overs = np.array([over for over, _ in wickets_inning], dtype=int)
+    counts = np.array([count for _, count in wickets_inning], dtype=int)
+    if counts.sum() == 0:
+        return np.array([]), np.array([]), []
+
+    # One marker per wicket, stacked above the run rate of its over
+    x = np.repeat(overs, counts)
+    stack = np.arange(len(x)) - np.repeat(np.cumsum(counts) - counts, counts)
+    run_rate_by_over = dict(run_rates)
+    y = np.array([run_rate_by_over[over] for over in x]) + stack * 0.3
+
+    dismissed_batters = dismissed_batters or {}
+    text = []
+    for over, i in zip(x.tolist(), stack.tolist()):
+        names = dismissed_batters.get(over, [])
+        text.append(names[i] if i < len(names) else "Wicket")
+    return x, y, text
+
+
+def _wicket_trace(x, y, text, inning):
+    return go.Scatter(
+        x=x,
+        y=y,
+        mode="markers",
+        marker=dict(color="red", size=10),
+        name=f"Wickets (Inning {inning})",
+        text=text,
+        hovertemplate="%{text}<extra></extra>",
+        showlegend=False,
+    )
+
+
+def wicket_traces(wicket_info, run_rates_1, run_rates_2, dismissed_batters=None):
+    """Return circles representing fall of wickets, one trace per innings."""
+    traces = []
     for inning, wickets_inning in enumerate(wicket_info, start=1):
         run_rates = run_rates_1 if inning == 1 else run_rates_2
-        for over, wicket_count in wickets_inning:
-            runs = run_rates[over - 1][1]  # Get the runs for the corresponding over
-            for i in range(wicket_count):
-                # Adjust y-coordinate for each additional wicket
-                fig.add_trace(
-                    go.Scatter(
-                        x=[over],
-                        y=[runs + i * 0.3],
-                        mode="markers",
-                        marker=dict(color="red", size=10),
-                        name=None,
-                        hoverinfo="skip",
-                        showlegend=False,
-                    )
-                )
+        batters = dismissed_batters[inning - 1] if dismissed_batters else None
+        x, y, text = _wicket_markers(wickets_inning, run_rates, batters)
+        if len(x):
+            traces.append(_wicket_trace(x, y, text, inning))
+    return traces
+
+
+@ins.traced("plotting_utils.add_wicket_circles")
+def add_wicket_circles(fig, wicket_info, run_rates_1, run_rates_2, dismissed_batters=None):
+    """Add circles representing fall of wickets to the plot, one trace per innings."""
+    fig.add_traces(wicket_traces(wicket_info, run_rates_1, run_rates_2, dismissed_batters))
     return fig
+
+
+def vertical_lines(x_values, y_range, name, line, text=None, **kwargs):
+    """Return a single trace drawing a vertical line at each x value, or None without values."""
+    x, y, hover = [], [], []
+    for i, value in enumerate(x_values):
+        # None breaks the line between segments
+        x += [value, value, None]
+        y += [y_range[0], y_range[1], None]
+        label = text[i] if text else name
+        hover += [label, label, None]
+    if not x:
+        return None
+    return go.Scatter(
+        x=x,
+        y=y,
+        mode="lines",
+        name=name,
+        line=line,
+        text=hover,
+        hovertemplate="%{text}<extra></extra>",
+        **kwargs,
+    )
+
+
+@ins.traced("plotting_utils.add_vertical_lines")
+def add_vertical_lines(fig, x_values, y_range, name, line, text=None, **kwargs):
+    """Draw a vertical line at each x value as a single trace."""
+    trace = vertical_lines(x_values, y_range, name, line, text, **kwargs)
+    if trace is not None:
+        fig.add_trace(trace)
+    return fig
+
+
 def calculate_bar_width(fig, num_visible_traces):
     """
     Calculate the width of bars based on the number of visible traces.
@@ -57,159 +272,110 @@ def calculate_bar_width(fig, num_visible_traces):
     return total_bar_width / num_visible_bars if num_visible_bars > 0 else 0
 
 
+@ins.traced("plotting_utils.add_wicket_circles_for_bar_chart")
 def add_wicket_circles_for_bar_chart(
-    fig, wicket_info_inning1, wicket_info_inning2, run_rates_1, run_rates_2
+    fig,
+    wicket_info_inning1,
+    wicket_info_inning2,
+    run_rates_1,
+    run_rates_2,
+    dismissed_batters=None,
 ):
-    """Add circles representing fall of wickets to the plot."""
+    """Add circles representing fall of wickets to the plot, one trace per innings."""
     bar_width = 0.6  # Adjust this value according to the width of your bars
 
-    # Plot circles for inning 1
-    for over, wicket_count in wicket_info_inning1:
-        runs = run_rates_1[over - 1][1]  # Get the runs for the corresponding over
-        for i in range(wicket_count):
-            # Calculate the x-coordinate to center the circle on top of the bar
-            x_coord = over - 0.5 + bar_width / 2
-            fig.add_trace(
-                go.Scatter(
-                    x=[x_coord],
-                    y=[runs + (i * 0.3) + 0.2],
-                    mode="markers",
-                    marker=dict(color="red", size=10),
-                    name=None,
-                    hoverinfo="skip",
-                    showlegend=False,
-                )
-            )
+    # Offsets that centre the circles on top of each innings' bar
+    x_offsets = {1: -0.5 + bar_width / 2, 2: -0.075 + bar_width / 2}
 
-    # Plot circles for inning 2
-    for over, wicket_count in wicket_info_inning2:
-        runs = run_rates_2[over - 1][1]  # Get the runs for the corresponding over
-        for i in range(wicket_count):
-            # Calculate the x-coordinate to center the circle on top of the bar
-            x_coord = over - 0.075 + bar_width / 2
-            fig.add_trace(
-                go.Scatter(
-                    x=[x_coord],
-                    y=[runs + (i * 0.3) + 0.2],
-                    mode="markers",
-                    marker=dict(color="red", size=10),
-                    name=None,
-                    hoverinfo="skip",
-                    showlegend=False,
-                )
-            )
+    wicket_info = [(wicket_info_inning1, run_rates_1), (wicket_info_inning2, run_rates_2)]
+    for inning, (wickets_inning, run_rates) in enumerate(wicket_info, start=1):
+        batters = dismissed_batters[inning - 1] if dismissed_batters else None
+        x, y, text = _wicket_markers(wickets_inning, run_rates, batters)
+        if len(x):
+            fig.add_trace(_wicket_trace(x + x_offsets[inning], y + 0.2, text, inning))
 
     return fig
 
-def customize_bar_chart(fig, max_overs):
-    """Customize the appearance of the bar chart."""
-    fig.update_layout(
-        title="<b>Run Rate Over Time - Innings 1 vs Innings 2</b>",
-        xaxis_title="<b>Over</b>",
-        yaxis_title="<b>Run Rate</b>",
-        font=dict(
-            family="Arial, sans-serif",
-            size=14,  # Increased font size for better readability
-            color="black",
-        ),
-        plot_bgcolor="rgba(240, 240, 240, 0.9)",  # Light gray background
-        paper_bgcolor="rgba(240, 240, 240, 0.9)",  # Light gray paper background
-        hovermode="x unified",  # Unified hover mode for better comparison
-        hoverlabel=dict(bgcolor="white", font_size=12, font_family="Arial, sans-serif"),
-        legend=dict(
-            title="<b>Innings</b>",
-            font=dict(family="Arial, sans-serif", size=12, color="black"),
-            bgcolor="rgba(255, 255, 255, 0.9)",  # Light gray legend background
-            itemsizing="constant",  # Ensure legend item size remains constant
-        ),
-        barmode="group",  # Grouped bars for better comparison
-        bargap=0.1,  # Gap between bars of adjacent location coordinates
-        bargroupgap=0.1,  # Gap between bars of the same location coordinate
-    )
 
-    # Add subtle animation
-    fig.update_layout(transition_duration=500)
+# Above this many traces, worm charts are drawn with WebGL instead of SVG
+WEBGL_TRACE_THRESHOLD = 40
 
-    # Update marker properties for enhanced appearance
-    fig.update_traces(marker=dict(opacity=0.9))
 
-    # Update x-axis tick labels to show every over
-    fig.update_xaxes(
-        tickmode="array",
-        tickvals=list(range(1, max_overs + 1)),
-        tickfont=dict(
-            size=12,  # Increased tick font size
-            color="black",
-        ),
-    )
+def worm_stride(n_balls, max_points=None, keep=()):
+    """Return the number of balls between the points drawn for each innings.
 
-    return fig
+    The stride keeps at most about max_points points per innings. A slightly
+    longer stride is used when it lands on every ball in keep.
+    """
+    if max_points is None or max_points >= n_balls:
+        return 1
+    stride = -(-n_balls // max(max_points, 1))
+    keep = [ball for ball in keep if 1 <= ball <= n_balls]
+    for candidate in range(stride, 2 * stride):
+        if all((n_balls - ball) % candidate == 0 for ball in keep):
+            return candidate
+    return stride
 
-def customize_plot_vs_score_plot(fig):
-    # Update layout for enhanced appearance
-    fig.update_layout(
-        xaxis_title="<b>Delivery</b>",
-        yaxis_title="<b>Score</b>",
-        font=dict(family="Arial, sans-serif", size=12, color="black"),
-        plot_bgcolor="rgba(255,255,255,0.9)",
-        paper_bgcolor="rgba(255,255,255,0.9)",
-        hovermode="x unified",  # Unified hover mode for better comparison
-        hoverlabel=dict(bgcolor="white", font_size=12, font_family="Arial, sans-serif"),
-        legend=dict(
-            title="<b>Innings</b>",
-            font=dict(family="Arial, sans-serif", size=12, color="black"),
-            bgcolor="rgba(255,255,255,0.9)",
-            itemsizing="constant",  # Ensure legend item size remains constant
-        ),
-    )
-    # fig.update_layout(
-    #     updatemenus=[
-    #         {
-    #             "buttons": [
-    #                 {
-    #                     "args": [{"visible": [False, True]}, {"title": "Inning 1"}],
-    #                     "label": "Inning 1",
-    #                     "method": "update",
-    #                 },
-    #                 {
-    #                     "args": [{"visible": [True, False]}, {"title": "Inning 2"}],
-    #                     "label": "Inning 2",
-    #                     "method": "update",
-    #                 },
-    #                 {
-    #                     "args": [{"visible": [True, True]}, {"title": "Both Innings"}],
-    #                     "label": "Both Innings",
-    #                     "method": "update",
-    #                 },
-    #             ],
-    #             "direction": "down",
-    #             "showactive": True,
-    #             "x": 0.5,
-    #             "xanchor": "center",
-    #             "y": 1.15,
-    #             "yanchor": "top",
-    #         },
-    #     ]
-    # )
-    # Add subtle animation
-    fig.update_layout(transition_duration=500)
-
-    # Update marker and line properties for enhanced appearance
-    fig.update_traces(marker=dict(size=8, opacity=0.9), line=dict(width=3))
-
-    # Add annotations for key moments in the match (optional)
-    fig.add_annotation(
-        x=60,
-        y=100,
-        text="Halfway Mark",
-        showarrow=True,
-        arrowhead=1,
-        ax=30,
-        ay=-30,
-        font=dict(color="black", size=12),
-    )
 
-    # Add custom hover information
-    fig.update_traces(hovertemplate="Delivery: %{x}<br>Score: %{y}<br>")
+def worm_grid(scores, max_points=None, keep=()):
+    """Choose the balls drawn for every innings of a worm chart, evenly spaced and ending on the last ball.
+
+    Every trace shares one start and stride, so the x values are sent as x0
+    and dx instead of an array per trace.
+    """
+    n_balls = scores.shape[1]
+    stride = worm_stride(n_balls, max_points, keep)
+    return np.arange((n_balls - 1) % stride, n_balls, stride)
+
+
+def worm_values(scores, grid):
+    """Return the scores at the grid balls.
+
+    An innings that ends between two grid balls is drawn on to the next one
+    at its final score, so that each line still reaches its total.
+    """
+    played = ~np.isnan(scores)
+    balls = np.arange(scores.shape[1])
+    # Score at or before each ball, carrying the final score past the end of the innings
+    latest = np.maximum.accumulate(np.where(played, balls, 0), axis=1)
+    filled = np.take_along_axis(scores, latest, axis=1)
+
+    last_balls = scores.shape[1] - 1 - np.argmax(played[:, ::-1], axis=1)
+    ends = grid[np.minimum(np.searchsorted(grid, last_balls), len(grid) - 1)]
+    values = filled[:, grid]
+    values[(grid[None, :] > ends[:, None]) | ~played.any(axis=1)[:, None]] = np.nan
+    return values
+
+
+@ins.traced("plotting_utils.worm_chart")
+def worm_chart(names, teams, scores, colors=None, max_points=None, webgl_threshold=WEBGL_TRACE_THRESHOLD, keep=()):
+    """Overlay the score progression of many innings on one shared legal-ball axis."""
+    grid = worm_grid(scores, max_points, keep)
+    # Legal-ball numbers are evenly spaced and shared by every trace, so no trace needs an x array
+    stride = int(grid[1] - grid[0]) if len(grid) > 1 else 1
+    x_axis = dict(x0=int(grid[0]) + 1, dx=stride)
+    trace_type = go.Scattergl if len(names) > webgl_threshold else go.Scatter
+    colors = colors or {}
+
+    traces = []
+    shown = set()
+    # Scores are whole numbers, so float32 halves the payload without losing precision
+    for name, team, row in zip(names, teams, worm_values(scores, grid).astype("float32")):
+        traces.append(
+            trace_type(
+                **x_axis,
+                y=row,
+                mode="lines",
+                name=team,
+                legendgroup=team,
+                showlegend=team not in shown,
+                line=dict(color=colors.get(team), width=1.5),
+                opacity=0.6 if len(names) > 2 else 1,
+                hovertemplate=f"{name}<br>Ball: %{{x}}<br>Score: %{{y}}<extra></extra>",
+            )
+        )
+        shown.add(team)
 
+    fig = figure("cricstat_worm", traces, title="Score Progression")
+    ins.count("traces_added", len(fig.data))
     return fig
@@ -0,0 +1,66 @@
+from aggregations import legal_ball_mask
+from lazy import lazy_import
+from phases import DEFAULT_FORMAT, PHASE_DEFINITIONS, over_types, phase_labels
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+def _apply_to_categories(series, func):
+    """Apply an element-wise conversion once per category instead of once per row."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = np.asarray(func(pd.Series(series.cat.categories)))
+        codes = series.cat.codes.to_numpy()
+        # Missing values have code -1 and map to NaN
+        result = np.where(codes >= 0, values[codes] if len(values) else np.nan, np.nan)
+        return pd.Series(result, index=series.index)
+    return pd.Series(np.asarray(func(series)), index=series.index)
+
+
+def _delivery_to_balls(delivery):
+    # "9.3" and "9.3*" (a no-ball) both refer to the third ball of the tenth over
+    parts = delivery.astype(str).str.rstrip("*").str.split(".", n=1, expand=True)
+    if parts.shape[1] < 2:
+        parts[1] = np.nan
+    overs = pd.to_numeric(parts[0], errors="coerce")
+    balls = pd.to_numeric(parts[1], errors="coerce")
+    return overs * 6 + balls
+
+
+def preprocess(df, phases=PHASE_DEFINITIONS[DEFAULT_FORMAT]):
+    """Add the derived delivery columns to a ball-by-ball DataFrame in one pass."""
+    if "delivery" in df.columns:
+        ball = _apply_to_categories(df["delivery"], _delivery_to_balls)
+        invalid = ball.isna()
+        if invalid.any():
+            print(f"Error: {int(invalid.sum())} deliveries could not be parsed.")
+        df["ball"] = ball.fillna(0).astype("int16")
+
+        legal = legal_ball_mask(df)
+        df["legal"] = legal.to_numpy()
+
+        # Legal-ball number within the innings; extras belong to the next legal ball
+        keys = [key for key in ["matchid", "innings"] if key in df.columns]
+        counted = legal.astype("int16")
+        if keys:
+            counted = counted.groupby([df[key] for key in keys], sort=False).cumsum()
+        else:
+            counted = counted.cumsum()
+        df["legal_ball"] = (counted + ~legal).astype("int16")
+        df["phase"] = phase_labels(df["legal_ball"], phases)
+
+    elif "over" in df.columns:
+        # Without deliveries, fall back to the phase of each over
+        over_phases = {
+            name: ((first_over - 1) * 6 + 1, last_over * 6)
+            for name, (first_over, last_over) in over_types(phases).items()
+        }
+        df["phase"] = phase_labels((df["over"] - 1) * 6 + 1, over_phases)
+
+    if "res" in df.columns:
+        # Convert 'res' column to numeric dtype
+        df["res"] = _apply_to_categories(
+            df["res"], lambda res: pd.to_numeric(res, errors="coerce")
+        ).astype("float32")
+
+    return df
@@ -0,0 +1,262 @@
+import argparse
+
+import preprocessing
+from aggregations import legal_ball_mask
+from lazy import lazy_import
+from phases import BALLS_PER_OVER, DEFAULT_FORMAT, PHASE_DEFINITIONS, phase_labels
+
+pd = lazy_import("pandas")
+
+# pyarrow is optional
+pa = lazy_import("pyarrow", optional=True)
+ds = lazy_import("pyarrow.dataset", optional=True)
+
+# Names usable in "by" and "where", and the column each one reads
+FIELDS = {
+    "batter": "batters",
+    "bowler": "bowlers",
+    "team": "battingteam",
+    "batting_team": "battingteam",
+    "bowling_team": "bowlingteam",
+    "match": "matchid",
+    "matchid": "matchid",
+    "innings": "innings",
+    "over": "over",
+    "phase": "phase",
+    "venue": "venue",
+    "dismissal": "dismissaltype",
+    "batting_position": "battingposition",
+}
+
+INTEGER_COLUMNS = {"matchid", "innings", "over", "battingposition"}
+
+# Per-ball measures summed by group, with the stored columns each one needs
+MEASURES = {
+    "runs": (["total"], lambda df: df["total"]),
+    "batter_runs": (["batterrun"], lambda df: df["batterrun"]),
+    "balls": ([], lambda df: df["legal"]),
+    "wickets": (["wicket"], lambda df: df["wicket"]),
+    "dots": (["total"], lambda df: df["legal"] & (df["total"] == 0)),
+    "fours": (["batterrun"], lambda df: df["batterrun"] == 4),
+    "sixes": (["batterrun"], lambda df: df["batterrun"] == 6),
+    "boundaries": (["batterrun"], lambda df: df["batterrun"].isin([4, 6])),
+}
+
+
+def _ratio(numerator, denominator, scale=1):
+    return (numerator * scale / denominator.where(denominator > 0)).round(2)
+
+
+# Metrics computed from the grouped measures
+METRICS = {
+    **{name: ([name], lambda sums, name=name: sums[name]) for name in MEASURES},
+    "strike_rate": (["batter_runs", "balls"], lambda s: _ratio(s["batter_runs"], s["balls"], 100)),
+    "run_rate": (["runs", "balls"], lambda s: _ratio(s["runs"], s["balls"], 6)),
+    "economy": (["runs", "balls"], lambda s: _ratio(s["runs"], s["balls"], 6)),
+    "balls_per_boundary": (["balls", "boundaries"], lambda s: _ratio(s["balls"], s["boundaries"])),
+    "dot_percentage": (["dots", "balls"], lambda s: _ratio(s["dots"], s["balls"], 100)),
+}
+
+# Questions from cric.txt and data/graphtype.txt as one-line queries
+PRESETS = {
+    "run_rate_by_phase": "metric=run_rate by=team,phase",
+    "wickets_by_phase": "metric=wickets by=bowling_team,phase",
+    "wickets_by_phase_and_bowler": "metric=wickets by=bowler,phase",
+    "dots_by_phase": "metric=dots by=team,phase",
+    "boundaries_by_phase": "metric=boundaries by=team,phase",
+    "balls_per_boundary_by_phase": "metric=balls_per_boundary by=team,phase",
+    "powerplay_strike_rate": "metric=strike_rate by=batter where phase=Powerplay",
+    "middle_overs_strike_rate": "metric=strike_rate by=batter where phase=Middle Overs",
+    "death_overs_strike_rate": "metric=strike_rate by=batter where phase=Death Overs",
+    "lower_order_runs": "metric=batter_runs by=team where batting_position=5|6|7",
+}
+
+
+def parse_query(text):
+    """Parse 'metric=<name> by=<field>[,<field>] where <field>=<value>[|<value>]; ...'.
+
+    Conditions are separated by ';' so that values such as venue names may contain commas.
+    """
+    text = PRESETS.get(text.strip(), text)
+    head, _, where = text.partition(" where ")
+
+    query = {"metric": None, "by": [], "where": {}}
+    for token in head.split():
+        key, _, value = token.partition("=")
+        if key == "metric":
+            query["metric"] = value
+        elif key == "by":
+            query["by"] = [field for field in value.split(",") if field]
+
+    for condition in where.split(";"):
+        key, _, value = condition.partition("=")
+        if key.strip():
+            query["where"][key.strip()] = [item.strip() for item in value.split("|")]
+
+    return query
+
+
+def _validate(query):
+    if query["metric"] not in METRICS:
+        print(f"Error: Unknown metric '{query['metric']}'.")
+        return False
+    for field in query["by"] + list(query["where"]):
+        if field not in FIELDS:
+            print(f"Error: Unknown field '{field}'.")
+            return False
+    return True
+
+
+def _filter_values(column, values):
+    if column in INTEGER_COLUMNS:
+        return [int(value) for value in values]
+    return values
+
+
+def _phase_over_ranges(values, match_format):
+    """Return the overs holding the legal balls of each phase; overs can be shared by two phases."""
+    phases = PHASE_DEFINITIONS[match_format]
+    return [
+        ((phases[value][0] - 1) // BALLS_PER_OVER + 1, (phases[value][1] - 1) // BALLS_PER_OVER + 1)
+        for value in values
+        if value in phases
+    ]
+
+
+def phase_column(df, match_format):
+    """Return the phase of every row by legal-ball number, as preprocessing.preprocess labels it.
+
+    Rows read from the dataset are filtered, so the legal-ball count cannot be
+    rebuilt from the start of the innings. The delivery number gives the same
+    number instead: wides are folded into the next ball and a no-ball carries
+    the number of the ball that follows it.
+    """
+    if "phase" in df.columns:
+        return df["phase"]
+    if "legal_ball" in df.columns:
+        legal_ball = df["legal_ball"]
+    else:
+        legal_ball = preprocessing._apply_to_categories(df["delivery"], preprocessing._delivery_to_balls)
+    return phase_labels(legal_ball, PHASE_DEFINITIONS[match_format])
+
+
+def _pushdown_filter(where, match_format):
+    """Translate the where clause into a pyarrow filter on stored columns.
+
+    Phases are not stored, so their overs are read and the balls outside the
+    phase are dropped afterwards by _apply_filters.
+    """
+    expression = None
+    for field, values in where.items():
+        column = FIELDS[field]
+        if column == "phase":
+            condition = None
+            for first_over, last_over in _phase_over_ranges(values, match_format):
+                in_phase = (ds.field("over") >= first_over) & (ds.field("over") <= last_over)
+                condition = in_phase if condition is None else condition | in_phase
+        else:
+            condition = ds.field(column).isin(_filter_values(column, values))
+        if condition is not None:
+            expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _source_columns(query):
+    """Return the stored columns needed to answer a query."""
+    columns = {"delivery", "Column2"}
+    for field in query["by"]:
+        if FIELDS[field] != "phase":
+            columns.add(FIELDS[field])
+    for measure in METRICS[query["metric"]][0]:
+        columns.update(MEASURES[measure][0])
+    return sorted(columns)
+
+
+def load_balls(query, dataset_dir, match_format=DEFAULT_FORMAT):
+    """Read only the rows and columns of the season dataset that a query needs."""
+    dataset = ds.dataset(
+        dataset_dir,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("matchid", pa.int32())]), flavor="hive"),
+    )
+    table = dataset.to_table(
+        columns=_source_columns(query), filter=_pushdown_filter(query["where"], match_format)
+    )
+    return table.to_pandas()
+
+
+def _apply_filters(df, where, match_format):
+    """Filter an in-memory frame with the where clause."""
+    mask = pd.Series(True, index=df.index)
+    for field, values in where.items():
+        column = FIELDS[field]
+        if column == "phase":
+            mask &= phase_column(df, match_format).isin(values).to_numpy()
+        else:
+            mask &= df[column].isin(_filter_values(column, values))
+    return df[mask]
+
+
+def evaluate(query, df, match_format=DEFAULT_FORMAT):
+    """Compute a parsed query's metric over already filtered ball-by-ball rows."""
+    by = [FIELDS[field] for field in query["by"]]
+    measures = METRICS[query["metric"]][0]
+
+    legal = df["legal"] if "legal" in df.columns else legal_ball_mask(df)
+    balls = df.assign(legal=legal)
+
+    columns = {}
+    for column in by:
+        if column == "phase":
+            columns[column] = phase_column(df, match_format)
+        else:
+            columns[column] = df[column]
+    for measure in measures:
+        columns[measure] = MEASURES[measure][1](balls).astype("int32")
+    frame = pd.DataFrame(columns)
+
+    if by:
+        sums = frame.groupby(by, observed=True)[measures].sum()
+    else:
+        sums = frame[measures].sum().to_frame().T
+
+    result = sums.assign(**{query["metric"]: METRICS[query["metric"]][1](sums)})
+    result = result[[query["metric"]] + [measure for measure in measures if measure != query["metric"]]]
+    return result.sort_values(query["metric"], ascending=False).reset_index(drop=not by)
+
+
+def run_query(text, dataset_dir=None, df=None, match_format=DEFAULT_FORMAT):
+    """Answer a query from the season dataset on disk, or from an in-memory frame."""
+    query = parse_query(text)
+    if not _validate(query):
+        return None
+
+    if df is not None:
+        balls = _apply_filters(df, query["where"], match_format)
+    elif dataset_dir is not None and pa is not None:
+        balls = load_balls(query, dataset_dir, match_format)
+        if "phase" in query["where"]:
+            balls = _apply_filters(balls, {"phase": query["where"]["phase"]}, match_format)
+    else:
+        print("Error: A season dataset (with pyarrow) or a DataFrame is required.")
+        return None
+
+    return evaluate(query, balls, match_format)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a query over the season dataset.")
+    parser.add_argument("query", help="query text or the name of a preset")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--format", default=DEFAULT_FORMAT, choices=sorted(PHASE_DEFINITIONS))
+    args = parser.parse_args(argv)
+
+    from season import Season
+
+    result = Season(args.data_dir).query(args.query, match_format=args.format)
+    if result is not None:
+        print(result.to_string())
+
+
+if __name__ == "__main__":
+    main()
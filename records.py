@@ -0,0 +1,162 @@
+import re
+from functools import lru_cache
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Flag bits packed into one small integer per delivery
+WIDE = 1
+NOBALL = 2
+LEGBYE = 4
+BYE = 8
+WICKET = 16
+BOUNDARY = 32
+
+FLAG_COLUMNS = {"wide": WIDE, "noball": NOBALL, "legbye": LEGBYE, "bye": BYE, "wicket": WICKET}
+
+BOUNDARY_RUNS = (4, 6)
+
+# A bye is a 'b' that is not part of 'lb' or 'nb'
+_BYE = re.compile(r"(?<![ln])b")
+_LEADING_DIGITS = re.compile(r"^\d+")
+
+
+@lru_cache(maxsize=None)
+def parse_res(code):
+    """Return (flags, runs) for a result code such as '4', '1wd', '4lb', 'nb' or 'W'.
+
+    runs is the number written in the code. For '4' or '6' it is the batter's
+    runs; for extras it is the extra runs scored on top of the penalty.
+    """
+    code = str(code)
+    flags = 0
+    if "wd" in code:
+        flags |= WIDE
+    if "nb" in code:
+        flags |= NOBALL
+    if "lb" in code:
+        flags |= LEGBYE
+    if _BYE.search(code):
+        flags |= BYE
+    if "W" in code:
+        flags |= WICKET
+    digits = _LEADING_DIGITS.match(code)
+    runs = int(digits.group()) if digits else 0
+    if code.isdigit() and runs in BOUNDARY_RUNS:
+        flags |= BOUNDARY
+    return flags, runs
+
+
+def parse_res_codes(codes):
+    """Parse a column of result codes, once per distinct code.
+
+    Returns a DataFrame with the packed flags, the runs written in each code
+    and one 0/1 column per flag, aligned with the input.
+    """
+    codes = pd.Series(codes)
+    positions, uniques = pd.factorize(codes.astype(str), sort=False)
+    parsed = np.array([parse_res(code) for code in uniques], dtype=np.int16).reshape(-1, 2)
+    flags = parsed[positions, 0].astype(np.uint8)
+    result = {"flags": flags, "runs": parsed[positions, 1]}
+    for column, bit in FLAG_COLUMNS.items():
+        result[column] = ((flags & bit) != 0).astype(np.int8)
+    return pd.DataFrame(result, index=codes.index)
+
+
+class NameTable:
+    """Intern names to small integer IDs."""
+
+    __slots__ = ("ids", "names")
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        player_id = self.ids.get(name)
+        if player_id is None:
+            player_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return player_id
+
+    def name(self, player_id):
+        return self.names[player_id]
+
+
+class Delivery:
+    """One ball-by-ball row with its flags packed into a single integer."""
+
+    __slots__ = ("innings", "over", "ball", "batter", "bowler", "flags", "batter_runs", "total")
+
+    def __init__(self, innings, over, ball, batter, bowler, flags, batter_runs, total):
+        self.innings = innings
+        self.over = over
+        self.ball = ball
+        self.batter = batter
+        self.bowler = bowler
+        self.flags = flags
+        self.batter_runs = batter_runs
+        self.total = total
+
+    @classmethod
+    def from_row(cls, row, names):
+        """Build a delivery from a CSV row dict, interning the player names."""
+        delivery = str(row["delivery"])
+        flags, _ = parse_res(row.get("Column2", ""))
+        if delivery.endswith("*"):
+            flags |= NOBALL
+        # The wicket column is authoritative; run outs off wides carry no 'W' on the ball
+        flags &= ~WICKET
+        if _to_int(row.get("wicket")):
+            flags |= WICKET
+        batter_runs = _to_int(row.get("batterrun"))
+        if batter_runs in BOUNDARY_RUNS:
+            flags |= BOUNDARY
+        else:
+            flags &= ~BOUNDARY
+        return cls(
+            _to_int(row["innings"]),
+            _to_int(row["over"]),
+            delivery,
+            names.intern(row.get("batters")),
+            names.intern(row.get("bowlers")),
+            flags,
+            batter_runs,
+            _to_int(row["total"]),
+        )
+
+    @property
+    def legal(self):
+        # A written wide can only be a raw row; wides are normally folded into the next ball
+        return not self.flags & (WIDE | NOBALL)
+
+    @property
+    def wicket(self):
+        return bool(self.flags & WICKET)
+
+    @property
+    def boundary(self):
+        return bool(self.flags & BOUNDARY)
+
+
+class Over:
+    """Running totals of one over of an innings."""
+
+    __slots__ = ("over", "runs", "wickets", "legal_balls", "score", "balls_bowled")
+
+    def __init__(self, over):
+        self.over = over
+        self.runs = 0
+        self.wickets = 0
+        self.legal_balls = 0
+        self.score = 0
+        self.balls_bowled = 0
+
+
+def _to_int(value):
+    """Convert a CSV field to int, treating blanks as zero."""
+    if value is None or value == "":
+        return 0
+    return int(float(value))
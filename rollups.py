@@ -0,0 +1,209 @@
+import argparse
+import json
+import os
+
+import preprocessing
+import query
+import schema
+import storage
+from ingest import MatchManifest
+from lazy import lazy_import
+from phases import DEFAULT_FORMAT, PHASE_DEFINITIONS
+from players import PlayerIndex
+
+pd = lazy_import("pandas")
+
+# pyarrow is optional; without it rollups are stored as CSV
+pa = lazy_import("pyarrow", optional=True)
+
+MANIFEST_FILE = "_manifest.json"
+
+# Rollup name and the columns it is grouped by
+ROLLUPS = {
+    "team_phase": ["battingteam", "phase"],
+    "batter_phase": ["batters", "phase"],
+    "bowler_phase": ["bowlers", "phase"],
+    "venue_innings": ["venue", "innings"],
+}
+
+# Only built when player information is available
+PLAYER_ROLLUPS = {
+    "bowlingtype_phase": ["bowlingtype", "phase"],
+}
+
+# Additive per-ball measures, so a new match is merged by adding its sums
+MEASURES = ["runs", "batter_runs", "balls", "wickets", "dots", "fours", "sixes", "boundaries"]
+
+# Rates derived from the stored sums when a rollup is read
+DERIVED_METRICS = ["run_rate", "strike_rate", "economy", "dot_percentage", "balls_per_boundary"]
+
+
+def _table_path(rollup_dir, name):
+    extension = "parquet" if pa is not None else "csv"
+    return os.path.join(rollup_dir, f"{name}.{extension}")
+
+
+def match_contributions(frames, rollups, phases):
+    """Sum the measures of some matches for every rollup."""
+    df = schema.concat_matches(frames)
+    df = preprocessing.preprocess(df, phases)
+
+    measures = pd.DataFrame(
+        {measure: query.MEASURES[measure][1](df).astype("int64") for measure in MEASURES},
+        index=df.index,
+    )
+    # Each group of one match counts that match once
+    measures["matches"] = 0
+
+    tables = {}
+    for name, keys in rollups.items():
+        if any(key not in df.columns for key in keys):
+            continue
+        grouped = pd.concat([df[keys + ["matchid"]], measures], axis=1)
+        grouped = grouped.groupby(keys + ["matchid"], observed=True).sum()
+        grouped["matches"] = 1
+        table = grouped.groupby(level=keys, observed=True).sum().reset_index()
+        for key in keys:
+            if key != "innings":
+                table[key] = table[key].astype(str)
+        tables[name] = table
+    return tables
+
+
+def merge(existing, contribution, keys):
+    """Add a contribution to a stored rollup, group by group."""
+    if existing is None:
+        return contribution
+    combined = pd.concat([existing, contribution], ignore_index=True)
+    return combined.groupby(keys, sort=False).sum().reset_index()
+
+
+def with_metrics(table):
+    """Add the derived rates to a rollup of summed measures."""
+    table = table.copy()
+    for metric in DERIVED_METRICS:
+        table[metric] = query.METRICS[metric][1](table)
+    return table
+
+
+class RollupStore:
+    """Materialized season rollups kept next to the match files."""
+
+    def __init__(self, data_dir, rollup_dir=None, match_format=DEFAULT_FORMAT, player_info_csv=None):
+        self.data_dir = data_dir
+        self.rollup_dir = rollup_dir or os.path.join(data_dir, "rollups")
+        self.match_format = match_format
+        self.player_info_csv = player_info_csv
+        self.rollups = dict(ROLLUPS)
+        if player_info_csv is not None:
+            self.rollups.update(PLAYER_ROLLUPS)
+
+    def load_manifest(self):
+        path = os.path.join(self.rollup_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as file:
+            return json.load(file)
+
+    def save_manifest(self, manifest):
+        with open(os.path.join(self.rollup_dir, MANIFEST_FILE), "w") as file:
+            json.dump(manifest, file, indent=2, sort_keys=True)
+
+    def read(self, name, metrics=True):
+        """Return a stored rollup, with derived rates unless metrics is False."""
+        path = _table_path(self.rollup_dir, name)
+        if not os.path.exists(path):
+            print(f"Error: Rollup '{name}' has not been built.")
+            return None
+        table = pd.read_parquet(path) if pa is not None else pd.read_csv(path)
+        return with_metrics(table) if metrics else table
+
+    def _write(self, name, table):
+        path = _table_path(self.rollup_dir, name)
+        if pa is not None:
+            table.to_parquet(path, index=False)
+        else:
+            table.to_csv(path, index=False)
+
+    def _read_matches(self, paths):
+        frames = [storage.read_match(path) for path in paths]
+        frames = [frame for frame in frames if frame is not None]
+        if frames and self.player_info_csv is not None:
+            try:
+                players = PlayerIndex.from_csv(self.player_info_csv)
+            except FileNotFoundError:
+                print(f"Error: File '{self.player_info_csv}' not found.")
+            else:
+                frames = [players.enrich(frame) for frame in frames]
+        return frames
+
+    def refresh(self):
+        """Merge any new match files into the rollups.
+
+        A changed or removed match file, a different match format, or a new
+        rollup means the old sums can no longer be trusted, so everything is
+        rebuilt from the match files.
+        """
+        os.makedirs(self.rollup_dir, exist_ok=True)
+        # The ingest manifest only hashes new or changed files and leaves out invalid ones
+        match_files = MatchManifest(self.data_dir)
+        report = match_files.refresh()
+        for name in report["invalid"]:
+            print(f"Error: Skipping invalid match file '{name}'.")
+        sources = {
+            name: {"path": os.path.join(self.data_dir, name), "hash": digest}
+            for name, digest in match_files.valid_files().items()
+        }
+        manifest = self.load_manifest()
+
+        rebuild = (
+            manifest is None
+            or manifest.get("format") != self.match_format
+            or sorted(manifest.get("rollups", [])) != sorted(self.rollups)
+            or any(
+                name not in sources or sources[name]["hash"] != entry["hash"]
+                for name, entry in manifest["matches"].items()
+            )
+        )
+        if rebuild:
+            manifest = {"format": self.match_format, "rollups": sorted(self.rollups), "matches": {}}
+        new = [name for name in sorted(sources) if name not in manifest["matches"]]
+        if not new:
+            return []
+
+        frames = self._read_matches([sources[name]["path"] for name in new])
+        if len(frames) != len(new):
+            print("Error: Some match files could not be read; the rollups were not changed.")
+            return []
+        tables = match_contributions(frames, self.rollups, PHASE_DEFINITIONS[self.match_format])
+        for name, keys in self.rollups.items():
+            if name not in tables:
+                continue
+            existing = None if rebuild else self.read(name, metrics=False)
+            self._write(name, merge(existing, tables[name], keys))
+
+        for name, frame in zip(new, frames):
+            manifest["matches"][name] = {"hash": sources[name]["hash"], "rows": len(frame)}
+        self.save_manifest(manifest)
+        return new
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or refresh the season rollups.")
+    parser.add_argument("data_dir", help="directory containing the match files")
+    parser.add_argument("--player-info", help="player information CSV, adds the bowling type rollup")
+    parser.add_argument("--format", default=DEFAULT_FORMAT, choices=sorted(PHASE_DEFINITIONS))
+    parser.add_argument("--show", choices=sorted({**ROLLUPS, **PLAYER_ROLLUPS}), help="print a rollup")
+    args = parser.parse_args(argv)
+
+    store = RollupStore(args.data_dir, match_format=args.format, player_info_csv=args.player_info)
+    added = store.refresh()
+    print(f"Merged {len(added)} match files into the rollups.")
+    if args.show:
+        table = store.read(args.show)
+        if table is not None:
+            print(table.to_string())
+
+
+if __name__ == "__main__":
+    main()
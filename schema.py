@@ -0,0 +1,118 @@
+from lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# Columns of the ball-by-ball CSV written by csv_extractor.ipynb, in file order
+COLUMNS = [
+    "matchid",
+    "date",
+    "venue",
+    "innings",
+    "over",
+    "delivery",
+    "battingteam",
+    "bowlingteam",
+    "Column2",
+    "res",
+    "impbat",
+    "batters",
+    "bowlers",
+    "impbowl",
+    "wide",
+    "extras",
+    "noball",
+    "legbye",
+    "bye",
+    "batterrun",
+    "wicket",
+    "batterdismissed",
+    "dismissaltype",
+    "total",
+    "score",
+    "wicketfell",
+    "strategictimeout",
+    "battingposition",
+    "bowlerwicket",
+    "powerplay",
+]
+
+# Names, teams and result codes repeat on every ball, so they are stored as categories
+CATEGORY_COLUMNS = [
+    "venue",
+    "delivery",
+    "battingteam",
+    "bowlingteam",
+    "Column2",
+    "res",
+    "batters",
+    "bowlers",
+    "batterdismissed",
+    "dismissaltype",
+]
+
+# Flags the extractor only sets on some rows and leaves empty elsewhere
+SPARSE_FLAG_COLUMNS = ["strategictimeout", "bowlerwicket"]
+
+DTYPES = {
+    "matchid": "int32",
+    "innings": "int8",
+    "over": "int8",
+    "impbat": "int8",
+    "impbowl": "int8",
+    "wide": "int8",
+    "extras": "int8",
+    "noball": "int8",
+    "legbye": "int8",
+    "bye": "int8",
+    "batterrun": "int8",
+    "wicket": "int8",
+    "total": "int8",
+    "score": "int16",
+    "wicketfell": "int8",
+    "strategictimeout": "Int8",
+    "battingposition": "Int8",
+    "bowlerwicket": "Int8",
+    "powerplay": "int8",
+    **{column: "category" for column in CATEGORY_COLUMNS},
+}
+
+DATE_FORMAT = "%d-%m-%Y"
+
+
+def read_match_csv(path, columns=None):
+    """Read a match CSV with the declared schema, loading only the given columns."""
+    if columns is None:
+        columns = COLUMNS
+
+    df = pd.read_csv(
+        path,
+        usecols=columns,
+        dtype={column: DTYPES[column] for column in columns if column in DTYPES},
+    )
+
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"], format=DATE_FORMAT)
+    for column in SPARSE_FLAG_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].fillna(0).astype("int8")
+
+    return df
+
+
+def concat_matches(frames):
+    """Concatenate match frames, keeping shared columns categorical."""
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+
+    # pd.concat falls back to object dtype unless the categories match exactly
+    for column in CATEGORY_COLUMNS:
+        if column not in frames[0].columns:
+            continue
+        categories = pd.api.types.union_categoricals(
+            [frame[column] for frame in frames], ignore_order=True
+        ).categories
+        for frame in frames:
+            frame[column] = frame[column].cat.set_categories(categories)
+
+    return pd.concat(frames, ignore_index=True)
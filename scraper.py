@@ -0,0 +1,462 @@
+import argparse
+import csv
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import records
+import schema
+import storage
+from lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# Classes of the cricket.com commentary page
+TEAM_CLASS = "lable-light dark:lable text-sm min-w-[25%]"
+DELIVERY_CLASS = "font-medium text-black dark:text-white text-xs lg:text-sm pt-1"
+RESULT_CLASS = "flex flex-col bg-lightbg dark:bg-gray rounded items-center"
+NAME_CLASS = "font-semibold"
+
+# Classes of the espncricinfo.com scorecard page
+MATCH_INFO_CLASS = "ds-text-tight-xs ds-truncate ds-text-typo-mid3 ds-mb-1"
+IMPACT_PLAYER_CLASS = "ds-text-tight-s ds-font-regular ds-pb-2 last:ds-pb-0"
+MATCH_FLOW_CLASSES = ["ds-text-tight-s", "ds-font-regular", "ds-list-disc", "ds-pt-2", "ds-px-4", "ds-mb-4"]
+
+DEFAULT_YEAR = "2024"
+
+
+class PageCache:
+    """Store raw HTML pages on disk, keyed by URL."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + ".html")
+
+    def get(self, url):
+        path = self.path(url)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as file:
+            return file.read()
+
+    def put(self, url, html):
+        with open(self.path(url), "w", encoding="utf-8") as file:
+            file.write(html)
+
+
+def scroll_to_bottom(driver, pause=0.5, max_pause=10, timeout=300):
+    """Scroll until the page height stops growing, backing off only while it is stable."""
+    last_height = driver.execute_script("return document.body.scrollHeight")
+    wait = pause
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        time.sleep(wait)
+        new_height = driver.execute_script("return document.body.scrollHeight")
+
+        if new_height == last_height:
+            # Give slow pages longer before deciding everything has loaded
+            if wait >= max_pause:
+                break
+            wait = min(wait * 2, max_pause)
+            continue
+
+        last_height = new_height
+        wait = pause
+
+
+def fetch_page(url, cache, pause=0.5, max_pause=10, timeout=300):
+    """Return the HTML of a page, loading it in a browser only when it is not cached."""
+    html = cache.get(url)
+    if html is not None:
+        return html
+
+    from selenium import webdriver
+
+    driver = webdriver.Chrome()
+    try:
+        driver.get(url)
+        scroll_to_bottom(driver, pause=pause, max_pause=max_pause, timeout=timeout)
+        html = driver.page_source
+    finally:
+        driver.quit()
+
+    cache.put(url, html)
+    return html
+
+
+def _soup(html):
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(html, "html.parser")
+
+
+def parse_commentary(html):
+    """Parse team order and ball-by-ball commentary from a cricket.com page."""
+    soup = _soup(html)
+
+    teamorder = [tag.get_text() for tag in soup.find_all("p", class_=[TEAM_CLASS])]
+
+    # The page lists the latest ball first
+    deliveries = [float(tag.get_text()) for tag in soup.find_all("p", class_=[DELIVERY_CLASS])]
+    deliveries.reverse()
+
+    results = [tag.find("p").text.strip() for tag in soup.find_all("div", class_=RESULT_CLASS)]
+    results.reverse()
+
+    names = [tag.get_text().strip(" ,") for tag in soup.find_all("span", class_=NAME_CLASS)]
+    names.reverse()
+
+    return {
+        "teamorder": teamorder,
+        "deliveries": deliveries,
+        "results": results,
+        "batters": names[::2],
+        "bowlers": names[1::2],
+    }
+
+
+def _over_number(text):
+    """Convert an 'N.0 ov' style over count to the delivery that ended it."""
+    over_number = float(text)
+    if over_number.is_integer() and over_number > 0:
+        over_number = over_number - 1 + 0.6
+    return round(over_number, 1)
+
+
+def _batting_card(rows):
+    """Return (batter, dismissal) pairs from the rows of a batting scorecard."""
+    card = []
+    for row in rows:
+        if "extras" in row.lower():
+            break
+        card.append(row)
+
+    trimmed = [
+        row.split("\xa0", 1)[0] if index % 2 == 0 and "\xa0" in row else row
+        for index, row in enumerate(card)
+    ]
+    return [(trimmed[i], trimmed[i + 1]) for i in range(0, len(trimmed) - 1, 2)]
+
+
+def _fall_of_wickets(text):
+    """Return (batter, delivery) pairs from a 'Fall of wickets' row."""
+    fall = []
+    for item in re.split(r",\s*(?![^()]*\))", text):
+        match = re.search(r"\((.*?)\)", item)
+        if match and ", " in match.group(1):
+            name, number = map(str.strip, match.group(1).split(", ", 1))
+            fall.append((name, _over_number(number[:-3])))
+    return fall
+
+
+def dismissal_type(dismissal):
+    """Classify a scorecard dismissal description."""
+    if "c " in dismissal and "b " in dismissal:
+        return "Caught Out"
+    if "st " in dismissal and "b " in dismissal:
+        return "Stumped Out"
+    if "run out" in dismissal:
+        return "Run Out"
+    if "lbw " in dismissal:
+        return "LBW"
+    if "hit wicket" in dismissal:
+        return "Hit Wicket"
+    if "b " in dismissal:
+        return "Bowled"
+    return "Not Out"
+
+
+def _powerplay_overs(events):
+    """Return the first and last over of the powerplay from the match flow."""
+    for event in events:
+        if "Powerplay" not in event:
+            continue
+        match = re.search(r"Overs\s(.*?)\s\(", event.strip())
+        if not match:
+            continue
+        bounds = []
+        for value in match.group(1).split(" - ")[:2]:
+            value = float(value)
+            if value.is_integer() and value > 0:
+                value -= 0.4
+            bounds.append(int(value) + 1)
+        if len(bounds) == 2:
+            return tuple(bounds)
+    return None
+
+
+def parse_scorecard(html, year=DEFAULT_YEAR):
+    """Parse venue, date, batting cards, fall of wickets and match flow from an espncricinfo page."""
+    soup = _soup(html)
+
+    date = None
+    info = soup.find_all("div", class_=MATCH_INFO_CLASS)
+    if info:
+        parts = info[0].text.strip().split(",")
+        if len(parts) > 2:
+            date_object = datetime.strptime(parts[2].strip() + " " + year, "%B %d %Y")
+            date = date_object.strftime(schema.DATE_FORMAT)
+
+    impact_players = []
+    impact = [tag.get_text() for tag in soup.find_all("div", class_=[IMPACT_PLAYER_CLASS])]
+    if len(impact) >= 2:
+        players = (impact[0] + impact[1]).split("\xa0")
+        impact_players = [player[:-4] for player in players if player[-4:] == " in,"]
+
+    tables = [[row.text for row in tbody.find_all("tr")] for tbody in soup.find_all("tbody")]
+    first = tables[0] if tables else []
+    second = tables[2] if len(tables) > 2 else []
+    venue = tables[-1][0] if tables and tables[-1] else None
+
+    # Split the match flow into the events of each innings
+    flow = [[], []]
+    divs = soup.find_all("div", class_=["ds-mb-4"])
+    if len(divs) > 6:
+        current = 0
+        for ul_tag in divs[6].find_all("ul", class_=MATCH_FLOW_CLASSES):
+            for li_tag in ul_tag.find_all("li"):
+                event = li_tag.text.strip()
+                if "Innings Break" in event:
+                    current = 1
+                    continue
+                flow[current].append(event)
+
+    innings = []
+    for rows, events in zip([first, second], flow):
+        timeouts = []
+        for event in events:
+            if "Strategic Timeout:" in event:
+                match = re.search(r"(\d+\.\d+) overs", event)
+                if match:
+                    timeouts.append(_over_number(match.group(1)))
+        innings.append(
+            {
+                "batting_card": _batting_card(rows),
+                "fall_of_wickets": _fall_of_wickets(rows[-1]) if rows else [],
+                "timeouts": timeouts,
+                "powerplay": _powerplay_overs(events),
+            }
+        )
+
+    return {"date": date, "venue": venue, "impact_players": impact_players, "innings": innings}
+
+
+def _delivery_rows(commentary, scorecard, matchid):
+    """Expand the commentary into rows, folding wides into the following ball."""
+    teamorder = commentary["teamorder"]
+    impact_players = set(scorecard["impact_players"])
+
+    # Flags and runs come from one parse per distinct result code
+    codes = records.parse_res_codes(pd.Series(commentary["results"], dtype=object))
+    flags = codes["flags"]
+    digits = codes["runs"].astype("int64")
+    wide = codes["wide"].astype("int64")
+    noball = codes["noball"].astype("int64")
+    legbye = codes["legbye"].astype("int64")
+    # Only a bare number such as '2' or '4' is runs off the bat
+    plain = (flags & (records.WIDE | records.NOBALL | records.LEGBYE | records.BYE | records.WICKET)) == 0
+
+    deliveries = pd.Series(commentary["deliveries"], dtype=float)
+    # An innings starts at the first 0.1; a wide or no-ball off it is re-bowled as 0.1 again
+    innings = ((deliveries == 0.1) & (deliveries.shift() != 0.1)).cumsum().clip(upper=2)
+    delivery = pd.Series(
+        [
+            str(value) + ("*" if is_noball else "")
+            for value, is_noball in zip(deliveries.tolist(), noball.tolist())
+        ]
+    )
+
+    batterrun = digits.where(plain, 0).where(noball == 0, digits.where(digits > 0, 1))
+    extras = (
+        (1 + digits).where(wide == 1, 0)
+        + digits.where((wide == 0) & (noball == 0) & ((legbye == 1) | (codes["bye"] == 1)), 0)
+    )
+    counted = pd.DataFrame(
+        {
+            "wide": wide,
+            "extras": extras,
+            "noball": noball,
+            "legbye": legbye,
+            "batterrun": batterrun,
+            "wicket": codes["wicket"].astype("int64"),
+        }
+    )
+    # A wide is re-bowled with the same delivery number, so totals run on while it repeats
+    repeats = (delivery != delivery.shift()).cumsum()
+    counted = counted.groupby(repeats, sort=False).cumsum()
+
+    second = innings == 2
+    df = pd.DataFrame(
+        {
+            "innings": innings,
+            "over": deliveries.astype("int64") + 1,
+            "delivery": delivery,
+            "battingteam": pd.Series(teamorder[0], index=delivery.index).where(~second, teamorder[1]),
+            "bowlingteam": pd.Series(teamorder[1], index=delivery.index).where(~second, teamorder[0]),
+            "Column2": commentary["results"],
+            "res": commentary["results"],
+            "impbat": pd.Series(commentary["batters"]).isin(impact_players).astype(int),
+            "batters": commentary["batters"],
+            "bowlers": commentary["bowlers"],
+            "impbowl": pd.Series(commentary["bowlers"]).isin(impact_players).astype(int),
+            "wide": counted["wide"],
+            "extras": counted["extras"],
+            "noball": counted["noball"],
+            "legbye": counted["legbye"],
+            "bye": codes["bye"].astype("int64"),
+            "batterrun": counted["batterrun"],
+            "wicket": counted["wicket"],
+        }
+    )
+    df = df[wide == 0].reset_index(drop=True)
+    df.insert(0, "matchid", matchid)
+    df.insert(1, "date", scorecard["date"])
+    df.insert(2, "venue", scorecard["venue"])
+    return df
+
+
+def build_match(commentary, scorecard, matchid):
+    """Combine a parsed commentary and scorecard into the ball-by-ball table."""
+    df = _delivery_rows(commentary, scorecard, matchid)
+    df["batterdismissed"] = None
+    df["dismissaltype"] = None
+    df["strategictimeout"] = 0
+    df["battingposition"] = None
+    df["powerplay"] = 0
+
+    for inning, details in enumerate(scorecard["innings"], start=1):
+        in_innings = df["innings"] == inning
+
+        for batter, delivery in details["fall_of_wickets"]:
+            condition = in_innings & (df["delivery"] == str(delivery)) & (df["wicket"] == 1)
+            df.loc[condition, "batterdismissed"] = batter
+
+        dismissals = {batter: dismissal_type(text) for batter, text in details["batting_card"]}
+        condition = in_innings & df["batterdismissed"].isin(list(dismissals))
+        df.loc[condition, "dismissaltype"] = df.loc[condition, "batterdismissed"].map(dismissals)
+
+        timeouts = [str(delivery) for delivery in details["timeouts"]]
+        df.loc[in_innings & df["delivery"].isin(timeouts), "strategictimeout"] = 1
+
+        # Only the first eleven names of the card are batters
+        positions = {
+            batter: position
+            for position, (batter, _) in enumerate(details["batting_card"][:11], start=1)
+        }
+        df.loc[in_innings, "battingposition"] = df.loc[in_innings, "batters"].map(positions)
+
+        if details["powerplay"]:
+            first_over, last_over = details["powerplay"]
+            df.loc[in_innings & df["over"].between(first_over, last_over), "powerplay"] = 1
+
+    df["total"] = df["batterrun"] + df["extras"]
+    df["score"] = df.groupby("innings")["total"].cumsum()
+    df["wicketfell"] = df.groupby("innings")["wicket"].cumsum()
+    df["bowlerwicket"] = ((df["dismissaltype"] != "Run Out") & (df["wicket"] == 1)).astype(int)
+
+    return df[schema.COLUMNS]
+
+
+def parse_match(job, commentary_html, scorecard_html, year=DEFAULT_YEAR):
+    """Parse the two saved pages of a match into its ball-by-ball table."""
+    return build_match(
+        parse_commentary(commentary_html), parse_scorecard(scorecard_html, year), job["matchid"]
+    )
+
+
+def _parse_and_write(job, commentary_html, scorecard_html, data_dir, year, file_format):
+    df = parse_match(job, commentary_html, scorecard_html, year)
+    path = os.path.join(data_dir, f"{job['matchid']}.{file_format}")
+    storage.write_match(df, path)
+    return path
+
+
+def ingest_matches(
+    jobs,
+    data_dir,
+    cache_dir,
+    workers=None,
+    browsers=1,
+    year=DEFAULT_YEAR,
+    file_format="parquet",
+    **scroll,
+):
+    """Fetch any uncached pages, then parse every match concurrently into data_dir.
+
+    Each job is a dict with ``matchid``, ``commentary_url`` and ``scorecard_url``.
+    """
+    cache = PageCache(cache_dir)
+    os.makedirs(data_dir, exist_ok=True)
+
+    # Browsers are heavy, so only a few pages are fetched at once
+    urls = [url for job in jobs for url in (job["commentary_url"], job["scorecard_url"])]
+    with ThreadPoolExecutor(max_workers=browsers) as executor:
+        pages = dict(zip(urls, executor.map(lambda url: fetch_page(url, cache, **scroll), urls)))
+
+    paths = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _parse_and_write,
+                job,
+                pages[job["commentary_url"]],
+                pages[job["scorecard_url"]],
+                data_dir,
+                year,
+                file_format,
+            )
+            for job in jobs
+        ]
+        for job, future in zip(jobs, futures):
+            try:
+                paths.append(future.result())
+            except Exception as error:
+                print(f"Error: Could not parse match {job['matchid']}: {error}")
+    return paths
+
+
+def read_jobs(path):
+    """Read match jobs from a CSV with matchid, commentary_url and scorecard_url columns."""
+    with open(path, newline="") as file:
+        return list(csv.DictReader(file))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape and parse match pages into data/.")
+    parser.add_argument("jobs", help="CSV with matchid, commentary_url and scorecard_url columns")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--cache-dir", default=os.path.join("cache", "pages"))
+    parser.add_argument("--workers", type=int, default=None, help="parser processes")
+    parser.add_argument("--browsers", type=int, default=1, help="concurrent browser sessions")
+    parser.add_argument("--year", default=DEFAULT_YEAR, help="year of the match dates")
+    parser.add_argument(
+        "--format", default="parquet", choices=storage.FILE_FORMATS, help="match file format"
+    )
+    parser.add_argument("--pause", type=float, default=0.5, help="initial scroll wait in seconds")
+    parser.add_argument("--max-pause", type=float, default=10, help="longest scroll wait in seconds")
+    args = parser.parse_args(argv)
+
+    paths = ingest_matches(
+        read_jobs(args.jobs),
+        args.data_dir,
+        args.cache_dir,
+        workers=args.workers,
+        browsers=args.browsers,
+        year=args.year,
+        file_format=args.format,
+        pause=args.pause,
+        max_pause=args.max_pause,
+    )
+    print(f"Wrote {len(paths)} matches to '{args.data_dir}'.")
+
+
+if __name__ == "__main__":
+    main()
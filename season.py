@@ -0,0 +1,188 @@
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import aggregations
+import plotting_utils as pu
+import preprocessing
+import query
+import schema
+import storage
+from lazy import lazy_import
+from phases import DEFAULT_FORMAT, PHASE_DEFINITIONS
+from players import PlayerIndex
+
+# pyarrow is optional
+pa = lazy_import("pyarrow", optional=True)
+ds = lazy_import("pyarrow.dataset", optional=True)
+pq = lazy_import("pyarrow.parquet", optional=True)
+
+# Match files are named after their match id, e.g. data/0.csv or data/0.parquet
+MATCH_FILE_PATTERN = re.compile(r"^(\d+)\.(csv|parquet|feather)$")
+
+SOURCES_FILE = "_sources.json"
+
+
+class Season:
+    def __init__(self, data_dir, dataset_dir=None, columns=None, max_workers=None):
+        self.data_dir = data_dir
+        self.dataset_dir = dataset_dir or os.path.join(data_dir, "season")
+        self.columns = columns
+        self.max_workers = max_workers
+        self.df = None
+
+    def match_files(self):
+        """Return the path of every match file in the data directory, one per match."""
+        files = {}
+        for name in os.listdir(self.data_dir):
+            match = MATCH_FILE_PATTERN.match(name)
+            if not match:
+                continue
+            matchid, file_format = int(match.group(1)), match.group(2)
+            # Prefer columnar files over CSV when a match exists in several formats
+            current = files.get(matchid)
+            if current is None or storage.FILE_FORMATS.index(file_format) < storage.FILE_FORMATS.index(current[1]):
+                files[matchid] = (name, file_format)
+        return [os.path.join(self.data_dir, files[matchid][0]) for matchid in sorted(files)]
+
+    def sources(self):
+        """Describe the match files the dataset is built from."""
+        return {
+            os.path.basename(path): os.path.getmtime(path) for path in self.match_files()
+        }
+
+    def read_csv(self, columns=None):
+        """Read every match file in parallel and concatenate them once."""
+        paths = self.match_files()
+        if not paths:
+            print(f"Error: No match files found in '{self.data_dir}'.")
+            self.df = None
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            frames = list(executor.map(lambda path: storage.read_match(path, columns), paths))
+
+        self.df = schema.concat_matches(frames)
+
+    def is_dataset_stale(self):
+        """Check whether the stored dataset is missing or out of date."""
+        sources_path = os.path.join(self.dataset_dir, SOURCES_FILE)
+        if not os.path.exists(sources_path):
+            return True
+        with open(sources_path) as file:
+            return json.load(file) != self.sources()
+
+    def write_dataset(self):
+        """Persist the season as a Parquet dataset partitioned by match."""
+        if pa is None:
+            print("Error: pyarrow is required to write the season dataset.")
+            return
+        if self.df is None:
+            print("Error: DataFrame is empty. Please read CSV files first.")
+            return
+
+        if os.path.isdir(self.dataset_dir):
+            shutil.rmtree(self.dataset_dir)
+
+        table = pa.Table.from_pandas(self.df, preserve_index=False)
+        pq.write_to_dataset(table, self.dataset_dir, partition_cols=["matchid"])
+
+        # Record the inputs so later runs can tell whether the dataset is current
+        with open(os.path.join(self.dataset_dir, SOURCES_FILE), "w") as file:
+            json.dump(self.sources(), file)
+
+    def read_dataset(self, columns=None):
+        """Load the stored dataset, memory-mapping the Parquet files."""
+        if pa is None:
+            print("Error: pyarrow is required to read the season dataset.")
+            self.df = None
+            return
+
+        partitioning = ds.partitioning(pa.schema([("matchid", pa.int32())]), flavor="hive")
+        table = pq.read_table(
+            self.dataset_dir,
+            columns=columns,
+            partitioning=partitioning,
+            memory_map=True,
+        )
+        df = table.to_pandas()
+
+        # Partition columns come back last and in directory order
+        if "matchid" in df.columns:
+            df = df.sort_values("matchid", kind="stable").reset_index(drop=True)
+        self.df = df[[column for column in schema.COLUMNS if column in df.columns]]
+
+    def load(self):
+        """Load the season, rebuilding the dataset only when the match files changed."""
+        if pa is not None and not self.is_dataset_stale():
+            self.read_dataset(self.columns)
+            return
+
+        if pa is None:
+            self.read_csv(self.columns)
+            return
+
+        # The stored dataset always holds every column
+        self.read_csv()
+        if self.df is not None:
+            self.write_dataset()
+            if self.columns is not None:
+                self.df = self.df[self.columns]
+
+    def query(self, text, match_format=DEFAULT_FORMAT):
+        """Answer a query, reading only the matching rows of the stored dataset."""
+        if pa is None:
+            if self.df is None:
+                self.read_csv()
+            return query.run_query(text, df=self.df, match_format=match_format)
+
+        if self.is_dataset_stale():
+            self.read_csv()
+            if self.df is None:
+                return None
+            self.write_dataset()
+        return query.run_query(text, dataset_dir=self.dataset_dir, match_format=match_format)
+
+    def plot_worm_chart(self, show=True, max_points=None, webgl_threshold=pu.WEBGL_TRACE_THRESHOLD, match_format=DEFAULT_FORMAT):
+        """Overlay the score progression of every innings of the season."""
+        if self.df is None:
+            print("Error: DataFrame is empty. Please load the season first.")
+            return None
+        if "legal_ball" not in self.df.columns:
+            self.preprocess_data(match_format)
+
+        phases = PHASE_DEFINITIONS[match_format]
+        max_balls = max(last_ball for _, last_ball in phases.values())
+        index, scores = aggregations.worm_scores(self.df, max_balls)
+
+        names = [f"{row.battingteam} - match {row.matchid}, innings {row.innings}" for row in index.itertuples()]
+        teams = index["battingteam"].astype(str).tolist()
+        colors = {team: pu.team_color(team) for team in set(teams)}
+        # Phase ends stay on the grid where a stride allows, so the phase boundaries are exact
+        keep = [last_ball for _, last_ball in phases.values()]
+
+        fig = pu.worm_chart(names, teams, scores, colors, max_points, webgl_threshold, keep)
+        if show:
+            fig.show()
+        return fig
+
+    def preprocess_data(self, match_format=DEFAULT_FORMAT):
+        """Add the derived delivery columns to the season DataFrame, with the phases of the match format."""
+        if self.df is not None:
+            self.df = preprocessing.preprocess(self.df, PHASE_DEFINITIONS[match_format])
+        else:
+            print("Error: DataFrame is empty. Please load the season first.")
+
+    def enrich_player_data(self, player_info_csv):
+        """Join batter and bowler attributes from a player information CSV."""
+        if self.df is None:
+            print("Error: DataFrame is empty. Please load the season first.")
+            return
+        try:
+            players = PlayerIndex.from_csv(player_info_csv)
+        except FileNotFoundError:
+            print(f"Error: File '{player_info_csv}' not found.")
+            return
+        self.df = players.enrich(self.df)
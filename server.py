@@ -0,0 +1,360 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import phases as ph
+import plotting_utils as pu
+import query
+from main import CHART_TYPES, chart_columns
+from season import Season
+from storage import file_hash
+
+DEFAULT_CACHE_SIZE = 256
+
+# Matches kept loaded in each worker process, so charts of one match share the parsing
+WORKER_MATCH_CACHE_SIZE = 8
+
+STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+_worker_matches = OrderedDict()
+
+
+def _loaded_match(path, digest, player_info_csv, match_format):
+    from match import Match
+
+    key = (path, digest, match_format)
+    match = _worker_matches.get(key)
+    if match is None:
+        match = Match(path, player_info_csv, match_format)
+        # Every chart of a match shares one load, so read the columns of all of them
+        match.read_csv(columns=chart_columns(CHART_TYPES))
+        match.preprocess_data()
+        _worker_matches[key] = match
+        if len(_worker_matches) > WORKER_MATCH_CACHE_SIZE:
+            _worker_matches.popitem(last=False)
+    else:
+        _worker_matches.move_to_end(key)
+    return match
+
+
+def match_figure_json(path, digest, player_info_csv, chart, match_format, inline_template=False):
+    """Build one chart of a match in a worker process and return it as Plotly JSON."""
+    match = _loaded_match(path, digest, player_info_csv, match_format)
+    fig = getattr(match, CHART_TYPES[chart])(show=False)
+    return None if fig is None else pu.figure_json(fig, inline_template)
+
+
+# Season charts that are not query presets
+SEASON_CHARTS = ["worm_chart"]
+
+
+def season_figure_json(data_dir, preset, match_format, max_points=None, inline_template=False):
+    """Draw a season chart (a query preset or the worm chart) and return it as Plotly JSON."""
+    import plotly.express as px
+
+    if preset == "worm_chart":
+        season = Season(data_dir)
+        season.load()
+        fig = season.plot_worm_chart(show=False, max_points=max_points, match_format=match_format)
+        return None if fig is None else pu.figure_json(fig, inline_template)
+
+    result = Season(data_dir).query(preset, match_format=match_format)
+    if result is None:
+        return None
+    parsed = query.parse_query(query.PRESETS[preset])
+    by = [query.FIELDS[field] for field in parsed["by"]]
+    fig = px.bar(
+        result,
+        x=by[-1] if by else None,
+        y=parsed["metric"],
+        color=by[0] if len(by) > 1 else None,
+        barmode="group",
+        title=preset.replace("_", " ").capitalize(),
+    )
+    return fig.to_json()
+
+
+class FigureCache:
+    """LRU cache of serialized figures that coalesces concurrent computations."""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key, compute):
+        """Return the cached value for key, awaiting compute() at most once at a time."""
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        # Join a computation of the same figure that is already running
+        future = self.pending.get(key)
+        if future is not None:
+            self.hits += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+        try:
+            value = await compute()
+        except BaseException as error:
+            # Waiters see the error, or are cancelled with the computation; nothing is
+            # cached so the next request retries
+            if isinstance(error, Exception):
+                future.set_exception(error)
+                future.exception()
+            else:
+                future.cancel()
+            raise
+        finally:
+            del self.pending[key]
+
+        future.set_result(value)
+        if value is not None:
+            self.entries[key] = value
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+
+def _inline_template(options):
+    """Return whether chart JSON includes its template, or None for an unknown choice."""
+    return {"inline": True, "shared": False}.get(options.get("templates", "shared"))
+
+
+def _worker_context():
+    """Start workers from a fresh process instead of forking the server."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class FigureServer:
+    def __init__(self, data_dir, player_info_csv, workers=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.data_dir = data_dir
+        self.player_info_csv = player_info_csv
+        # Forked workers would inherit the listening socket and every open client
+        # connection, so clients never saw the connection close
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=_worker_context())
+        self.cache = FigureCache(cache_size)
+        self.hashes = {}
+        self.season_lock = asyncio.Lock()
+
+    def match_paths(self):
+        return {
+            os.path.splitext(os.path.basename(path))[0]: path
+            for path in Season(self.data_dir).match_files()
+        }
+
+    async def file_digest(self, path):
+        """Hash a match file, rehashing only when its size or modification time changed."""
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self.hashes.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        digest = await asyncio.to_thread(file_hash, path)
+        self.hashes[path] = (stamp, digest)
+        return digest
+
+    async def season_digest(self):
+        paths = self.match_paths()
+        digests = [await self.file_digest(path) for path in paths.values()]
+        return hashlib.sha256("".join(sorted(digests)).encode()).hexdigest()
+
+    async def match_chart(self, name, chart, options):
+        paths = self.match_paths()
+        if name not in paths:
+            return 404, {"error": f"Match '{name}' not found."}, None
+        if chart not in CHART_TYPES:
+            return 404, {"error": f"Unknown chart type '{chart}'."}, None
+        match_format = options.get("format", ph.DEFAULT_FORMAT)
+        if match_format not in ph.PHASE_DEFINITIONS:
+            return 400, {"error": f"Unknown match format '{match_format}'."}, None
+
+        inline_template = _inline_template(options)
+        if inline_template is None:
+            return 400, {"error": "templates must be 'inline' or 'shared'."}, None
+
+        path = paths[name]
+        digest = await self.file_digest(path)
+        # Only the options the route reads, so unknown query parameters share the cached figure
+        key = (digest, chart, match_format, inline_template)
+        loop = asyncio.get_running_loop()
+        body = await self.cache.get(
+            key,
+            lambda: loop.run_in_executor(
+                self.pool,
+                match_figure_json,
+                path,
+                digest,
+                self.player_info_csv,
+                chart,
+                match_format,
+                inline_template,
+            ),
+        )
+        return 200, body, f'"{digest[:16]}-{chart}"'
+
+    async def season_chart(self, preset, options):
+        if preset not in query.PRESETS and preset not in SEASON_CHARTS:
+            return 404, {"error": f"Unknown season chart '{preset}'."}, None
+        match_format = options.get("format", ph.DEFAULT_FORMAT)
+        if match_format not in ph.PHASE_DEFINITIONS:
+            return 400, {"error": f"Unknown match format '{match_format}'."}, None
+        max_points = options.get("max_points")
+        if max_points is not None and not max_points.isdigit():
+            return 400, {"error": "max_points must be a whole number."}, None
+        inline_template = _inline_template(options)
+        if inline_template is None:
+            return 400, {"error": "templates must be 'inline' or 'shared'."}, None
+
+        digest = await self.season_digest()
+        key = (digest, preset, match_format, int(max_points) if max_points else None, inline_template)
+
+        async def compute():
+            # Only one worker at a time may rebuild the shared season dataset
+            async with self.season_lock:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.pool,
+                    season_figure_json,
+                    self.data_dir,
+                    preset,
+                    match_format,
+                    int(max_points) if max_points else None,
+                    inline_template,
+                )
+
+        body = await self.cache.get(key, compute)
+        return 200, body, f'"{digest[:16]}-{preset}"'
+
+    async def route(self, target):
+        """Return (status, body, etag) for a request path."""
+        url = urlsplit(target)
+        options = dict(parse_qsl(url.query))
+        parts = [part for part in url.path.split("/") if part]
+
+        if parts == ["matches"]:
+            return 200, {"matches": sorted(self.match_paths(), key=lambda name: (len(name), name))}, None
+        if parts == ["charts"]:
+            return 200, {"match": sorted(CHART_TYPES), "season": sorted(query.PRESETS) + SEASON_CHARTS}, None
+        if parts == ["templates"]:
+            return 200, {"templates": sorted(pu.TEMPLATES)}, None
+        if len(parts) == 2 and parts[0] == "templates":
+            body = pu.template_json(parts[1])
+            if body is None:
+                return 404, {"error": f"Unknown template '{parts[1]}'."}, None
+            return 200, body, None
+        if parts == ["stats"]:
+            return 200, {
+                "cached": len(self.cache.entries),
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+            }, None
+        if len(parts) == 3 and parts[0] == "matches":
+            return await self.match_chart(parts[1], parts[2], options)
+        if len(parts) == 2 and parts[0] == "season":
+            return await self.season_chart(parts[1], options)
+        return 404, {"error": f"No route for '{url.path}'."}, None
+
+    async def handle(self, reader, writer):
+        """Serve GET requests on one connection, keeping it open between requests."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                if method != "GET":
+                    status, body, etag = 400, {"error": "Only GET is supported."}, None
+                else:
+                    try:
+                        status, body, etag = await self.route(target)
+                    except Exception as error:
+                        print(f"Error: Could not serve '{target}': {error}")
+                        status, body, etag = 500, {"error": str(error)}, None
+                if status == 200 and body is None:
+                    status, body = 500, {"error": "The chart could not be drawn."}
+
+                if etag is not None and headers.get("if-none-match") == etag and status == 200:
+                    status, body = 304, ""
+                if not isinstance(body, str):
+                    body = json.dumps(body)
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                payload = body.encode()
+                head = [
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(payload)}",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ]
+                if etag is not None:
+                    head.append(f"ETag: {etag}")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self.pool.shutdown()
+
+
+async def serve(data_dir, player_info_csv, host="127.0.0.1", port=8050, workers=None, cache_size=DEFAULT_CACHE_SIZE):
+    figure_server = FigureServer(data_dir, player_info_csv, workers, cache_size)
+    server = await asyncio.start_server(figure_server.handle, host, port)
+    print(f"Serving CricStat charts on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        figure_server.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve CricStat charts as Plotly JSON.")
+    parser.add_argument("data_dir", help="directory containing the match files")
+    parser.add_argument(
+        "--player-info",
+        default=os.path.join("data", "playerdata.csv"),
+        help="player information CSV",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="figures kept in memory")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        asyncio.run(serve(args.data_dir, args.player_info, args.host, args.port, args.workers, args.cache_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+
+import aggregations
+import instrumentation as ins
+import preprocessing
+from lazy import lazy_import
+from phases import BALLS_PER_OVER, DEFAULT_FORMAT, PHASE_DEFINITIONS
+from season import Season
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Stored next to the match files, outside data/season/ which is rebuilt from scratch
+INDEX_FILE = "similarity.npz"
+
+INNINGS_KEYS = ["matchid", "innings"]
+
+# Up to this many innings, queries compare against every innings
+EXACT_LIMIT = 20000
+
+# Clusters searched per query by the approximate index
+DEFAULT_PROBES = 8
+
+KMEANS_ITERATIONS = 10
+
+
+def innings_features(df, match_format=DEFAULT_FORMAT):
+    """Encode every innings as a fixed-length vector.
+
+    Returns (index, features, blocks): one row per innings with its batting
+    team, a float32 array with one row per innings, and the name of the block
+    each feature belongs to. The blocks are the score at the end of each over,
+    the run rate of each phase and the wickets down at the end of each over.
+    Overs after the end of an innings keep its final score and wickets.
+    """
+    phases = PHASE_DEFINITIONS[match_format]
+    max_balls = max(last_ball for _, last_ball in phases.values())
+    overs = -(-max_balls // BALLS_PER_OVER)
+    if "legal_ball" not in df.columns:
+        df = preprocessing.preprocess(df.copy(), phases)
+
+    innings = df.groupby(INNINGS_KEYS, sort=True, observed=True)
+    index = innings["battingteam"].first().astype(str).reset_index()
+    positions = pd.MultiIndex.from_frame(index[INNINGS_KEYS])
+
+    summary = aggregations.over_summary(df)
+    summary = summary[(summary["over"] >= 1) & (summary["over"] <= overs)]
+    over_columns = pd.RangeIndex(1, overs + 1)
+    curves = []
+    for column in ["score", "wicketfell"]:
+        curve = summary.pivot_table(index=INNINGS_KEYS, columns="over", values=column, aggfunc="last", observed=True)
+        curve = curve.reindex(index=positions, columns=over_columns).ffill(axis=1).fillna(0)
+        curves.append(curve.to_numpy())
+
+    legal = df["legal"].astype("int16")
+    phase_totals = pd.DataFrame(
+        {"runs": df["total"], "balls": legal, "phase": df["phase"], **{key: df[key] for key in INNINGS_KEYS}}
+    ).groupby(INNINGS_KEYS + ["phase"], observed=False)[["runs", "balls"]].sum()
+    runs = phase_totals["runs"].unstack("phase").reindex(index=positions, columns=list(phases)).fillna(0)
+    balls = phase_totals["balls"].unstack("phase").reindex(index=positions, columns=list(phases)).fillna(0)
+    run_rates = (runs * BALLS_PER_OVER / balls.where(balls > 0)).fillna(0).to_numpy()
+
+    features = np.hstack([curves[0], run_rates, curves[1]]).astype("float32")
+    blocks = ["score"] * overs + ["phase_run_rate"] * len(phases) + ["wickets"] * overs
+    return index, features, blocks
+
+
+def _squared_distances(vectors, queries):
+    """Squared Euclidean distances between every query and every vector."""
+    return (
+        (queries * queries).sum(axis=1)[:, None]
+        - 2 * queries @ vectors.T
+        + (vectors * vectors).sum(axis=1)[None, :]
+    )
+
+
+def _kmeans(vectors, clusters, iterations=KMEANS_ITERATIONS, seed=0):
+    """Return k-means centroids and the cluster of every vector."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _squared_distances(centroids, vectors).argmin(axis=1)
+        counts = np.bincount(labels, minlength=clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids, _squared_distances(centroids, vectors).argmin(axis=1)
+
+
+class SimilarityIndex:
+    """Nearest-neighbour search over innings feature vectors.
+
+    Features are standardized and each block is scaled to the same total
+    weight, so the score curve, phase run rates and wicket timing count
+    equally. Up to EXACT_LIMIT innings every query is exact; beyond that the
+    vectors are clustered and a query only searches the closest clusters.
+    """
+
+    def __init__(self, index, vectors, mean, scale, centroids=None, order=None, offsets=None, sources=None, match_format=DEFAULT_FORMAT):
+        self.index = index
+        self.vectors = vectors
+        self.mean = mean
+        self.scale = scale
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.sources = sources or {}
+        self.match_format = match_format
+        self.positions = {
+            (int(matchid), int(inning)): position
+            for position, (matchid, inning) in enumerate(zip(index["matchid"], index["innings"]))
+        }
+
+    @property
+    def approximate(self):
+        return self.centroids is not None
+
+    @classmethod
+    @ins.traced("similarity.build")
+    def build(cls, df, match_format=DEFAULT_FORMAT, approximate=None, sources=None):
+        """Build the index from ball-by-ball data; approximate defaults to len > EXACT_LIMIT."""
+        index, features, blocks = innings_features(df, match_format)
+        if not len(index):
+            print("Error: No innings to index.")
+            return None
+
+        mean = features.mean(axis=0)
+        std = features.std(axis=0)
+        block_sizes = pd.Series(blocks).map(pd.Series(blocks).value_counts()).to_numpy()
+        scale = (1 / np.where(std > 0, std, 1) / np.sqrt(block_sizes)).astype("float32")
+        vectors = ((features - mean) * scale).astype("float32")
+
+        if approximate is None:
+            approximate = len(vectors) > EXACT_LIMIT
+        centroids = order = offsets = None
+        if approximate:
+            clusters = max(1, int(np.sqrt(len(vectors))))
+            centroids, labels = _kmeans(vectors, clusters)
+            order = np.argsort(labels, kind="stable")
+            offsets = np.searchsorted(labels[order], np.arange(clusters + 1))
+        return cls(index, vectors, mean, scale, centroids, order, offsets, sources, match_format)
+
+    def encode(self, df):
+        """Return the index rows and normalized vectors of the innings in df."""
+        index, features, _ = innings_features(df, self.match_format)
+        return index, ((features - self.mean) * self.scale).astype("float32")
+
+    def _candidates(self, vector, probes):
+        if not self.approximate:
+            return None
+        nearest = np.argsort(_squared_distances(self.centroids, vector[None, :])[0])[:probes]
+        return np.concatenate([self.order[self.offsets[cluster]:self.offsets[cluster + 1]] for cluster in nearest])
+
+    def nearest(self, vector, k=5, exclude=None, probes=DEFAULT_PROBES):
+        """Return the k innings closest to a normalized vector, leaving out the (matchid, innings) exclude."""
+        candidates = self._candidates(vector, probes)
+        vectors = self.vectors if candidates is None else self.vectors[candidates]
+        distances = np.maximum(_squared_distances(vectors, vector[None, :])[0], 0)
+        if exclude is not None and exclude in self.positions:
+            position = self.positions[exclude]
+            excluded = position if candidates is None else np.flatnonzero(candidates == position)
+            distances[excluded] = np.inf
+
+        k = min(k, len(distances))
+        best = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+        best = best[np.argsort(distances[best], kind="stable")]
+        best = best[np.isfinite(distances[best])]
+        rows = best if candidates is None else candidates[best]
+        result = self.index.iloc[rows].reset_index(drop=True)
+        result["distance"] = np.sqrt(distances[best])
+        return result
+
+    def query(self, matchid, inning, k=5, probes=DEFAULT_PROBES):
+        """Return the k innings most like an indexed innings."""
+        position = self.positions.get((matchid, inning))
+        if position is None:
+            print(f"Error: Innings {inning} of match {matchid} is not in the index.")
+            return None
+        return self.nearest(self.vectors[position], k, (matchid, inning), probes)
+
+    def save(self, path):
+        arrays = dict(
+            matchid=self.index["matchid"].to_numpy(),
+            innings=self.index["innings"].to_numpy(),
+            battingteam=self.index["battingteam"].to_numpy().astype(str),
+            vectors=self.vectors,
+            mean=self.mean,
+            scale=self.scale,
+            sources=np.array(json.dumps(self.sources, sort_keys=True)),
+            match_format=np.array(self.match_format),
+        )
+        if self.approximate:
+            arrays.update(centroids=self.centroids, order=self.order, offsets=self.offsets)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            print(f"Error: Index file '{path}' not found.")
+            return None
+        with np.load(path) as arrays:
+            index = pd.DataFrame(
+                {"matchid": arrays["matchid"], "innings": arrays["innings"], "battingteam": arrays["battingteam"]}
+            )
+            clusters = [arrays[name] if name in arrays else None for name in ["centroids", "order", "offsets"]]
+            return cls(
+                index,
+                arrays["vectors"],
+                arrays["mean"],
+                arrays["scale"],
+                *clusters,
+                sources=json.loads(str(arrays["sources"])),
+                match_format=str(arrays["match_format"]),
+            )
+
+    @classmethod
+    def for_season(cls, data_dir, match_format=DEFAULT_FORMAT, approximate=None):
+        """Load the stored index of a season, rebuilding it when the match files changed."""
+        season = Season(data_dir)
+        sources = season.sources()
+        path = os.path.join(data_dir, INDEX_FILE)
+        if os.path.exists(path):
+            stored = cls.load(path)
+            if (
+                stored is not None
+                and stored.sources == sources
+                and stored.match_format == match_format
+                and (approximate is None or stored.approximate == approximate)
+            ):
+                return stored
+
+        season.load()
+        if season.df is None:
+            return None
+        df = preprocessing.preprocess(season.df, PHASE_DEFINITIONS[match_format])
+        built = cls.build(df, match_format, approximate, sources)
+        if built is not None:
+            built.save(path)
+        return built
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the innings most like a given one.")
+    parser.add_argument("data_dir", help="directory containing the match files")
+    parser.add_argument("matchid", type=int)
+    parser.add_argument("innings", type=int, choices=[1, 2])
+    parser.add_argument("-k", type=int, default=5, help="number of innings to list")
+    parser.add_argument("--format", default=DEFAULT_FORMAT, choices=sorted(PHASE_DEFINITIONS))
+    parser.add_argument("--approximate", action="store_true", help="cluster the innings even for a small season")
+    args = parser.parse_args(argv)
+
+    index = SimilarityIndex.for_season(args.data_dir, args.format, True if args.approximate else None)
+    if index is None:
+        return
+    result = index.query(args.matchid, args.innings, args.k)
+    if result is not None:
+        print(result.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+
+import schema
+from lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# pyarrow is optional
+pa = lazy_import("pyarrow", optional=True)
+feather = lazy_import("pyarrow.feather", optional=True)
+pq = lazy_import("pyarrow.parquet", optional=True)
+
+# Columns with one value per match, stored once as file metadata in columnar files
+MATCH_METADATA_COLUMNS = ["matchid", "date", "venue"]
+
+METADATA_KEY = b"cricstat"
+
+COLUMNAR_FORMATS = ("parquet", "feather")
+
+# Preferred format first when a match exists in several
+FILE_FORMATS = COLUMNAR_FORMATS + ("csv",)
+
+
+def file_hash(path):
+    """Return the SHA-256 digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_format(path):
+    """Return the storage format of a match file from its extension."""
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    return extension if extension in FILE_FORMATS else None
+
+
+def _typed(df):
+    """Project a match onto the declared columns and apply the declared dtypes."""
+    df = df[[column for column in schema.COLUMNS if column in df.columns]].copy()
+    for column in schema.SPARSE_FLAG_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column]).fillna(0).astype("int8")
+    dtypes = {
+        column: dtype
+        for column, dtype in schema.DTYPES.items()
+        if column in df.columns and column not in schema.SPARSE_FLAG_COLUMNS
+    }
+    for column, dtype in dtypes.items():
+        if dtype.startswith("Int"):
+            df[column] = pd.to_numeric(df[column]).astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def write_match(df, path):
+    """Write one match as Parquet, Feather or CSV depending on the file extension."""
+    file_type = file_format(path)
+    if file_type is None:
+        print(f"Error: Unknown match file format '{path}'.")
+        return
+    if file_type == "csv":
+        df.to_csv(path, index=False)
+        return
+    if pa is None:
+        print("Error: pyarrow is required to write columnar match files.")
+        return
+
+    metadata = {}
+    for column in MATCH_METADATA_COLUMNS:
+        if column in df.columns and len(df):
+            value = df[column].iloc[0]
+            if column == "date":
+                # Scraped dates are day-first strings, so parse them with the schema's format
+                value = (
+                    pd.to_datetime(value, format=schema.DATE_FORMAT).strftime(schema.DATE_FORMAT)
+                    if pd.notna(value)
+                    else None
+                )
+            elif pd.notna(value):
+                value = value.item() if hasattr(value, "item") else str(value)
+            metadata[column] = value
+
+    df = _typed(df.drop(columns=[column for column in MATCH_METADATA_COLUMNS if column in df.columns]))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), METADATA_KEY: json.dumps(metadata).encode()}
+    )
+
+    if file_type == "parquet":
+        pq.write_table(table, path)
+    else:
+        feather.write_feather(table, path)
+
+
+def read_metadata(path):
+    """Return the match-level metadata stored in a columnar match file."""
+    if file_format(path) == "parquet":
+        metadata = pq.read_schema(path).metadata or {}
+    else:
+        with pa.memory_map(path) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    return json.loads(metadata.get(METADATA_KEY, b"{}"))
+
+
+def read_match(path, columns=None):
+    """Read one match file of any supported format, loading only the given columns."""
+    file_type = file_format(path)
+    if file_type == "csv":
+        return schema.read_match_csv(path, columns)
+    if file_type is None:
+        print(f"Error: Unknown match file format '{path}'.")
+        return None
+    if pa is None:
+        print("Error: pyarrow is required to read columnar match files.")
+        return None
+
+    if columns is None:
+        columns = schema.COLUMNS
+    stored_columns = [column for column in columns if column not in MATCH_METADATA_COLUMNS]
+
+    if file_type == "parquet":
+        table = pq.read_table(path, columns=stored_columns, memory_map=True)
+    else:
+        table = feather.read_table(path, columns=stored_columns, memory_map=True)
+    df = table.to_pandas()
+
+    # Broadcast the match-level values back onto every row
+    metadata = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b"{}"))
+    for position, column in enumerate(columns):
+        if column not in MATCH_METADATA_COLUMNS:
+            continue
+        value = metadata.get(column)
+        if column == "matchid":
+            values = pd.Series(value, index=df.index, dtype="int32")
+        elif column == "date":
+            values = pd.Series(
+                pd.to_datetime(value, format=schema.DATE_FORMAT), index=df.index
+            )
+        else:
+            values = pd.Series(value, index=df.index, dtype="category")
+        df.insert(min(position, len(df.columns)), column, values)
+
+    return df
+
+
+def export_csv(path, csv_path):
+    """Write a columnar match file back out in the extractor's CSV layout."""
+    df = read_match(path)
+    if df is not None:
+        df.to_csv(csv_path, index=False, date_format=schema.DATE_FORMAT)
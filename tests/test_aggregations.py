@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+import aggregations
+import preprocessing
+from match import Match
+
+# innings, over, delivery, Column2, batterrun, extras, wicket
+BALLS = [
+    (1, 10, "9.1", "1", 1, 0, 0),
+    # A wide folded into the next ball, which went for four
+    (1, 10, "9.2", "4", 4, 1, 0),
+    # A no-ball is re-bowled with the same number
+    (1, 10, "9.3*", "nb", 1, 0, 0),
+    (1, 10, "9.3", "W", 0, 0, 1),
+    (1, 10, "9.4", "0", 0, 0, 0),
+    (1, 10, "9.5", "2", 2, 0, 0),
+    (1, 10, "9.6", "6", 6, 0, 0),
+    (1, 11, "10.1", "1", 1, 0, 0),
+    (2, 1, "0.1*", "nb", 1, 0, 0),
+    (2, 1, "0.1", "W", 0, 0, 1),
+    (2, 1, "0.2", "4", 4, 0, 0),
+]
+
+
+def _balls():
+    df = pd.DataFrame(BALLS, columns=["innings", "over", "delivery", "Column2", "batterrun", "extras", "wicket"])
+    df.insert(0, "matchid", 0)
+    df["total"] = df["batterrun"] + df["extras"]
+    return df
+
+
+@pytest.mark.parametrize("preprocessed", [False, True])
+def test_over_summary_counts_legal_balls(preprocessed):
+    df = _balls()
+    if preprocessed:
+        df = preprocessing.preprocess(df)
+    summary = aggregations.over_summary(df).set_index(["innings", "over"])
+
+    assert summary["legal_balls"].to_dict() == {(1, 10): 6, (1, 11): 1, (2, 1): 2}
+    assert summary["runs"].to_dict() == {(1, 10): 15, (1, 11): 1, (2, 1): 5}
+    assert summary["wickets"].to_dict() == {(1, 10): 1, (1, 11): 0, (2, 1): 1}
+    assert summary["balls_bowled"].to_dict() == {(1, 10): 6, (1, 11): 7, (2, 1): 2}
+    assert summary["run_rate"].to_dict() == {(1, 10): 15.0, (1, 11): 13.71, (2, 1): 15.0}
+
+
+def test_calculate_run_rate_per_innings():
+    match = Match(None, None)
+    match.df = preprocessing.preprocess(_balls())
+    run_rates_1, run_rates_2 = match.calculate_run_rate()
+    assert run_rates_1 == [(10, 15.0), (11, 13.71)]
+    assert run_rates_2 == [(1, 15.0)]
+    assert match.number_of_wicket_fell_in_an_over()[0] == [(10, 1), (11, 0)]
@@ -0,0 +1,57 @@
+import os
+import shutil
+
+import pandas as pd
+
+import ingest
+import schema
+
+MATCH_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "0.csv")
+
+
+def _match():
+    return schema.read_match_csv(MATCH_FILE)
+
+
+def test_valid_match_has_no_problems():
+    assert ingest.validate(_match(), 0) == []
+
+
+def test_mismatched_matchid():
+    assert ingest.validate(_match(), 5) == ["match id 0 does not match the file name"]
+
+
+def test_deliveries_going_backwards():
+    df = _match()
+    df["delivery"] = df["delivery"].astype(str)
+    # Swap the second and third balls of the first over
+    df.loc[[1, 2], "delivery"] = ["0.3", "0.2"]
+    problems = ingest.validate(df, 0)
+    assert problems == ["delivery goes backwards (row 3, 1 rows)"]
+
+
+def test_refresh_marks_duplicates_and_skips_unchanged_files(tmp_path, monkeypatch):
+    shutil.copy(MATCH_FILE, tmp_path / "0.csv")
+    shutil.copy(MATCH_FILE, tmp_path / "1.csv")
+    report = ingest.MatchManifest(str(tmp_path)).refresh()
+    assert sorted(report["new"]) == ["0.csv", "1.csv"]
+    # The copy fails validation for its name and duplicates the first file
+    assert report["duplicates"] == ["1.csv"]
+    assert report["invalid"] == ["1.csv"]
+    assert list(ingest.MatchManifest(str(tmp_path)).valid_files()) == ["0.csv"]
+
+    read = []
+    original = ingest.ingest_file
+    monkeypatch.setattr(ingest, "ingest_file", lambda path: read.append(os.path.basename(path)) or original(path))
+    report = ingest.MatchManifest(str(tmp_path)).refresh()
+    assert read == []
+    assert sorted(report["unchanged"]) == ["0.csv", "1.csv"]
+    assert report["new"] == report["changed"] == []
+
+    df = pd.read_csv(tmp_path / "1.csv", dtype=str, keep_default_na=False)
+    df["matchid"] = "1"
+    df.to_csv(tmp_path / "1.csv", index=False)
+    report = ingest.MatchManifest(str(tmp_path)).refresh()
+    assert read == ["1.csv"]
+    assert report["changed"] == ["1.csv"]
+    assert report["invalid"] == report["duplicates"] == []
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+import kernels
+
+# innings, delivery, Column2, batter, total, wicket
+BALLS = [
+    (1, "0.1", "0", "A", 0, 0),
+    (1, "0.2", "4", "A", 4, 0),
+    # A wide that was not folded into the next ball
+    (1, "0.3", "1wd", "A", 1, 0),
+    (1, "0.3", "0", "A", 0, 0),
+    (1, "0.4", "W", "A", 0, 1),
+    (1, "0.5", "1", "B", 1, 0),
+    (2, "0.1", "W", "C", 0, 1),
+    (2, "0.2", "0", "D", 0, 0),
+    (2, "0.3", "6", "D", 6, 0),
+]
+
+
+def _innings():
+    df = pd.DataFrame(BALLS, columns=["innings", "delivery", "Column2", "batters", "total", "wicket"])
+    df.insert(0, "matchid", 0)
+    df["batterrun"] = df["total"].where(df["Column2"] != "1wd", 0)
+    return df
+
+
+def test_balls_since_boundary():
+    df = _innings()
+    assert kernels.balls_since_boundary(df).tolist() == [1, 0, 0, 1, 2, 3, 1, 2, 0]
+    assert kernels.balls_since_boundary(df, by="batters").tolist() == [1, 0, 0, 1, 2, 1, 1, 1, 0]
+
+
+def test_balls_since_wicket():
+    assert kernels.balls_since_wicket(_innings()).tolist() == [1, 2, 2, 3, 0, 1, 0, 1, 2]
+
+
+def test_dot_streak():
+    # The wide is not a dot ball, and a wicket without runs is
+    assert kernels.dot_streak(_innings()).tolist() == [1, 0, 0, 1, 2, 0, 1, 2, 0]
+
+
+def test_run_rate_around():
+    df = _innings()
+    around = kernels.run_rate_around(df, df["wicket"].astype(bool), window=2)
+    nan = np.nan
+    # Before the first wicket: 5 runs off balls 2-3; after it: 1 run off ball 5, where the innings ends
+    np.testing.assert_array_equal(around["run_rate_before"], [nan, nan, nan, nan, 15.0, nan, nan, nan, nan])
+    # The second innings starts with a wicket, so nothing comes before it
+    np.testing.assert_array_equal(around["run_rate_after"], [nan, nan, nan, nan, 6.0, nan, 18.0, nan, nan])
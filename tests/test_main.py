@@ -0,0 +1,46 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import main
+from match import Match
+
+MATCH_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "0.csv")
+
+
+def _chart_json(chart, columns):
+    match = Match(MATCH_FILE, None)
+    match.read_csv(columns=columns)
+    match.preprocess_data()
+    return getattr(match, main.CHART_TYPES[chart])(show=False).to_json()
+
+
+def test_every_chart_declares_its_columns():
+    assert set(main.PLOT_COLUMNS) == set(main.CHART_TYPES)
+
+
+@pytest.mark.parametrize("chart", sorted(main.CHART_TYPES))
+def test_chart_draws_the_same_from_its_columns(chart):
+    assert _chart_json(chart, main.chart_columns([chart])) == _chart_json(chart, None)
+
+
+def test_render_all_only_caches_rendered_matches(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for name in ["0.csv", "1.csv"]:
+        shutil.copy(MATCH_FILE, data_dir / name)
+
+    # Render in threads, failing to read the second match the way a missing file does
+    render_match = main.render_match
+    monkeypatch.setattr(main, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(
+        main,
+        "render_match",
+        lambda path, *args: [] if path.endswith("1.csv") else render_match(path, *args),
+    )
+
+    output_dir = str(tmp_path / "output")
+    main.render_all(str(data_dir), ["scatter_chart"], ["json"], output_dir, None)
+    assert list(main.load_render_cache(output_dir)) == ["0.csv"]
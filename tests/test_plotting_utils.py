@@ -0,0 +1,52 @@
+import json
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+import plotting_utils as pu
+
+
+def _figure():
+    return pu.figure("cricstat_bar", [go.Bar(x=[1, 2, 3], y=[6.0, 8.5, 7.0])], title="Run Rate")
+
+
+def test_inlined_figure_json_is_standalone():
+    fig = _figure()
+    restored = pio.from_json(pu.figure_json(fig, inline_template=True))
+    assert restored.layout.template == pio.templates["cricstat_bar"]
+    assert restored.layout.title.text == "Run Rate"
+    assert restored.to_dict() == fig.to_dict()
+
+
+def test_shared_template_round_trip():
+    fig = _figure()
+    shared = pu.figure_json(fig)
+    fig_dict = json.loads(shared)
+    assert fig_dict["layout"]["template"] == "cricstat_bar"
+    assert len(shared) < len(pu.figure_json(fig, inline_template=True))
+
+    restored = pio.from_json(json.dumps(pu.merge_template(fig_dict)))
+    assert restored.to_dict() == fig.to_dict()
+
+
+def test_template_json_matches_registered_template():
+    template = json.loads(pu.template_json("cricstat_worm"))
+    assert go.layout.Template(template) == pio.templates["cricstat_worm"]
+    assert pu.template_json("unknown") is None
+
+
+def test_worm_chart_shares_x_when_downsampled():
+    import numpy as np
+
+    scores = np.full((3, 120), np.nan)
+    scores[0] = np.arange(120)
+    scores[1, :100] = np.arange(100) * 2
+    scores[2, :7] = 5
+    fig = pu.worm_chart(["a", "b", "c"], ["MI", "CSK", "MI"], scores, max_points=40, keep=[36, 90, 120])
+
+    for trace in fig.data:
+        assert trace.x is None
+        assert (trace.x0, trace.dx) == (3, 3)
+        assert len(trace.y) == 40
+    # Each line still reaches the final score of its innings
+    assert [np.asarray(trace.y)[~np.isnan(trace.y)][-1] for trace in fig.data] == [119, 198, 5]
@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+import pytest
+
+from rollups import ROLLUPS, RollupStore
+
+MATCH_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "0.csv")
+
+
+def _write_match(data_dir, matchid, venue=None):
+    df = pd.read_csv(MATCH_FILE, dtype=str, keep_default_na=False)
+    df["matchid"] = str(matchid)
+    if venue is not None:
+        df["venue"] = venue
+    df.to_csv(os.path.join(data_dir, f"{matchid}.csv"), index=False)
+
+
+def _rollups(store):
+    tables = {}
+    for name, keys in ROLLUPS.items():
+        table = store.read(name, metrics=False)
+        tables[name] = table.sort_values(keys).reset_index(drop=True)
+    return tables
+
+
+def _assert_same_as_rebuild(store, data_dir, tmp_path, label):
+    rebuilt = RollupStore(data_dir, str(tmp_path / f"rebuilt_{label}"))
+    rebuilt.refresh()
+    expected = _rollups(rebuilt)
+    for name, table in _rollups(store).items():
+        pd.testing.assert_frame_equal(table, expected[name], check_dtype=False)
+
+
+@pytest.fixture
+def season(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    _write_match(str(data_dir), 0)
+    _write_match(str(data_dir), 1)
+    return str(data_dir)
+
+
+def test_added_match_is_merged_like_a_rebuild(season, tmp_path):
+    store = RollupStore(season, str(tmp_path / "rollups"))
+    assert store.refresh() == ["0.csv", "1.csv"]
+
+    _write_match(season, 2, venue="Wankhede Stadium, Mumbai")
+    assert store.refresh() == ["2.csv"]
+    assert store.load_manifest()["matches"].keys() == {"0.csv", "1.csv", "2.csv"}
+    _assert_same_as_rebuild(store, season, tmp_path, "added")
+
+    venues = store.read("venue_innings")
+    assert set(venues["venue"]) == {"Arun Jaitley Stadium, Delhi", "Wankhede Stadium, Mumbai"}
+    # One row per venue and innings, counting each match once
+    assert sorted(venues["matches"]) == [1, 1, 2, 2]
+
+
+def test_changed_match_rebuilds(season, tmp_path):
+    store = RollupStore(season, str(tmp_path / "rollups"))
+    store.refresh()
+    before = _rollups(store)
+
+    _write_match(season, 1, venue="Eden Gardens, Kolkata")
+    _write_match(season, 2)
+    # A changed file invalidates the stored sums, so every match is read again
+    assert store.refresh() == ["0.csv", "1.csv", "2.csv"]
+    _assert_same_as_rebuild(store, season, tmp_path, "changed")
+
+    after = _rollups(store)
+    assert after["team_phase"]["runs"].sum() == before["team_phase"]["runs"].sum() * 3 // 2
+    assert store.refresh() == []
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+import schema
+import scraper
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _read(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as file:
+        return file.read()
+
+
+@pytest.fixture(scope="module")
+def commentary():
+    return scraper.parse_commentary(_read("commentary.html"))
+
+
+@pytest.fixture(scope="module")
+def scorecard():
+    return scraper.parse_scorecard(_read("scorecard.html"))
+
+
+@pytest.fixture(scope="module")
+def match(commentary, scorecard):
+    return scraper.build_match(commentary, scorecard, 7)
+
+
+def test_parse_commentary(commentary):
+    assert commentary["teamorder"] == ["RCB", "MI"]
+    # The page lists the latest ball first; the parse is in the order bowled
+    assert commentary["deliveries"][:3] == [0.1, 0.1, 0.2]
+    assert commentary["results"][:3] == ["1wd", "4", "W"]
+    assert commentary["batters"][0] == "Virat Kohli"
+    assert commentary["bowlers"][0] == "Jasprit Bumrah"
+    assert len(commentary["batters"]) == len(commentary["bowlers"]) == len(commentary["deliveries"]) == 11
+
+
+def test_parse_scorecard(scorecard):
+    assert scorecard["date"] == "22-05-2024"
+    assert scorecard["venue"] == "Narendra Modi Stadium, Ahmedabad"
+    assert scorecard["impact_players"] == ["Ishan Kishan"]
+    first, second = scorecard["innings"]
+    assert first["batting_card"] == [("Virat Kohli", "c Kishan b Bumrah"), ("Faf du Plessis", "not out")]
+    assert first["fall_of_wickets"] == [("Virat Kohli", 0.2)]
+    assert first["timeouts"] == [0.6]
+    assert first["powerplay"] == (1, 1)
+    assert second["fall_of_wickets"] == []
+
+
+def test_build_match_rows(match):
+    assert list(match.columns) == schema.COLUMNS
+    # The wide off the first ball is folded into it, so it does not start a new innings
+    assert match["innings"].tolist() == [1] * 7 + [2] * 3
+    assert match["delivery"].tolist() == ["0.1", "0.2", "0.3*", "0.3", "0.4", "0.5", "0.6", "0.1*", "0.1", "0.2"]
+    assert match["battingteam"].tolist() == ["RCB"] * 7 + ["MI"] * 3
+    assert match["bowlingteam"].tolist() == ["MI"] * 7 + ["RCB"] * 3
+    assert match["score"].tolist() == [6, 6, 7, 9, 10, 10, 16, 1, 2, 6]
+    assert match["wicketfell"].tolist() == [0, 1, 1, 1, 1, 1, 1, 0, 0, 0]
+    assert (match["matchid"] == 7).all()
+    assert (match["venue"] == "Narendra Modi Stadium, Ahmedabad").all()
+
+
+def test_build_match_extras(match):
+    first_ball = match.iloc[0]
+    assert (first_ball["extras"], first_ball["batterrun"], first_ball["total"]) == (2, 4, 6)
+    assert match.loc[match["res"] == "1lb", ["legbye", "extras", "batterrun"]].values.tolist() == [[1, 1, 0]]
+    assert match["noball"].tolist() == [0, 0, 1, 0, 0, 0, 0, 1, 0, 0]
+
+
+def test_build_match_scorecard_details(match):
+    wicket = match[match["wicket"] == 1]
+    assert wicket["batterdismissed"].tolist() == ["Virat Kohli"]
+    assert wicket["dismissaltype"].tolist() == ["Caught Out"]
+    assert wicket["bowlerwicket"].tolist() == [1]
+    assert match.loc[match["strategictimeout"] == 1, "delivery"].tolist() == ["0.6"]
+    assert match["battingposition"].tolist() == [1, 1, 2, 2, 2, 2, 2, 1, 1, 2]
+    assert match["impbat"].tolist() == [0] * 9 + [1]
+    assert (match["powerplay"] == 1).all()
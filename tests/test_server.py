@@ -0,0 +1,26 @@
+import asyncio
+import os
+import shutil
+
+import server
+
+MATCH_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "0.csv")
+
+
+def test_unknown_query_parameters_share_the_cached_figure(tmp_path):
+    shutil.copy(MATCH_FILE, tmp_path / "0.csv")
+
+    async def requests():
+        figure_server = server.FigureServer(str(tmp_path), None, workers=1)
+        try:
+            first = await figure_server.route("/matches/0/scatter_chart")
+            second = await figure_server.route("/matches/0/scatter_chart?utm_source=mail&format=T20")
+            inlined = await figure_server.route("/matches/0/scatter_chart?templates=inline")
+            return first, second, inlined, figure_server.cache
+        finally:
+            figure_server.close()
+
+    first, second, inlined, cache = asyncio.run(requests())
+    assert first[0] == second[0] == inlined[0] == 200
+    assert first[1] == second[1]
+    assert (len(cache.entries), cache.hits, cache.misses) == (2, 1, 2)
@@ -0,0 +1,33 @@
+import os
+
+import pandas as pd
+import pytest
+
+import scraper
+import storage
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+pytest.importorskip("pyarrow")
+
+
+def _read(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as file:
+        return file.read()
+
+
+@pytest.mark.parametrize("extension", ["parquet", "feather", "csv"])
+def test_round_trip_keeps_day_first_date(tmp_path, extension):
+    # 05-06-2024 is the 5th of June; read month-first it would be the 6th of May
+    scorecard = _read("scorecard.html").replace("May 22, 2024", "June 5, 2024")
+    df = scraper.parse_match({"matchid": 7}, _read("commentary.html"), scorecard)
+    assert df["date"].iloc[0] == "05-06-2024"
+
+    path = str(tmp_path / f"7.{extension}")
+    storage.write_match(df, path)
+    if extension != "csv":
+        assert storage.read_metadata(path)["date"] == "05-06-2024"
+
+    restored = storage.read_match(path)
+    assert (restored["date"] == pd.Timestamp(2024, 6, 5)).all()
+    assert restored["score"].tolist() == df["score"].tolist()
@@ -0,0 +1,268 @@
+import argparse
+import os
+
+import instrumentation as ins
+import preprocessing
+from lazy import lazy_import
+from phases import DEFAULT_FORMAT, PHASE_DEFINITIONS
+
+np = lazy_import("numpy")
+
+MAX_WICKETS = 10
+
+# Runs axis of the lookup tables, as runs per legal ball of the format; larger values are clipped
+MAX_RUNS_PER_BALL = 3
+
+# Weight, in innings states, of the smooth prior that sparse (balls, wickets) cells are shrunk towards
+PRIOR_WEIGHT = 20
+
+# Smallest standard deviation, so finished innings (no balls or wickets left) are deterministic
+MIN_SD = 1e-3
+
+OVER_KEYS = ["matchid", "innings", "over"]
+
+
+def _normal_cdf(z):
+    """Standard normal CDF, vectorized (Abramowitz and Stegun 7.1.26, error below 1.5e-7)."""
+    x = np.abs(z) / np.sqrt(2)
+    t = 1 / (1 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1 - poly * np.exp(-x * x)
+    return 0.5 * (1 + np.sign(z) * erf)
+
+
+def innings_states(df, max_balls):
+    """Return (balls_remaining, wickets, runs_to_come) for every state of the first innings.
+
+    Each legal ball gives the state after it, and each innings adds its starting
+    state. Runs to come are what the innings went on to score from there.
+    """
+    df = df[df["innings"] == 1]
+    final = df.groupby("matchid", sort=False, observed=True)["score"].transform("last")
+    legal = df["legal"].to_numpy()
+    balls = max_balls - df["legal_ball"].to_numpy()[legal].astype("int64")
+    wickets = df["wicketfell"].to_numpy()[legal].astype("int64")
+    runs = (final - df["score"]).to_numpy()[legal].astype("float64")
+
+    starts = df.groupby("matchid", sort=False, observed=True)["score"].last().to_numpy()
+    balls = np.concatenate([np.full(len(starts), max_balls), balls])
+    wickets = np.concatenate([np.zeros(len(starts), dtype="int64"), wickets])
+    runs = np.concatenate([starts.astype("float64"), runs])
+    keep = (balls >= 0) & (balls <= max_balls) & (wickets >= 0) & (wickets <= MAX_WICKETS)
+    return balls[keep], wickets[keep], runs[keep]
+
+
+class WinProbabilityModel:
+    """Projected scores and win probabilities from lookup tables over the match state.
+
+    The state is (legal balls remaining, wickets lost, runs). The tables hold the
+    mean and spread of the runs still to come in an innings, learned from the
+    first innings of a season, and the win probabilities derived from them:
+
+    - chase[b, w, r]: the chasing side scores at least r more runs
+    - first[b, w, s]: the side batting first wins from s runs
+    """
+
+    def __init__(self, mean, sd, chase, first, max_balls):
+        self.mean = mean
+        self.sd = sd
+        self.chase = chase
+        self.first = first
+        self.max_balls = max_balls
+        self.max_runs = chase.shape[2] - 1
+
+    @classmethod
+    @ins.traced("winprob.fit")
+    def fit(cls, df, match_format=DEFAULT_FORMAT):
+        """Learn the tables from a season of ball-by-ball data."""
+        phases = PHASE_DEFINITIONS[match_format]
+        max_balls = max(last_ball for _, last_ball in phases.values())
+        if "legal_ball" not in df.columns:
+            df = preprocessing.preprocess(df.copy(), phases)
+        balls, wickets, runs = innings_states(df, max_balls)
+        if not len(runs):
+            print("Error: No first-innings deliveries to learn from.")
+            return None
+
+        shape = (max_balls + 1, MAX_WICKETS + 1)
+        cell = balls * shape[1] + wickets
+        count = np.bincount(cell, minlength=shape[0] * shape[1]).reshape(shape)
+        total = np.bincount(cell, runs, minlength=count.size).reshape(shape)
+        squares = np.bincount(cell, runs * runs, minlength=count.size).reshape(shape)
+
+        # Prior: runs and variance grow in proportion to the balls left, at a rate per wickets lost
+        balls_left = np.maximum(np.bincount(wickets, balls, minlength=shape[1]), 1)
+        rate = np.bincount(wickets, runs, minlength=shape[1]) / balls_left
+        residual = runs - rate[wickets] * balls
+        spread = np.bincount(wickets, residual * residual, minlength=shape[1]) / balls_left
+        ball_axis = np.arange(shape[0])[:, None]
+        prior_mean = ball_axis * rate[None, :]
+        prior_var = ball_axis * spread[None, :]
+
+        weight = count + PRIOR_WEIGHT
+        mean = (total + PRIOR_WEIGHT * prior_mean) / weight
+        second = (squares + PRIOR_WEIGHT * (prior_var + prior_mean ** 2)) / weight
+        var = np.maximum(second - mean ** 2, 0)
+
+        # More balls never mean fewer runs to come, and more wickets never mean more
+        mean = np.maximum.accumulate(mean, axis=0)
+        mean = np.minimum.accumulate(mean, axis=1)
+        mean[0, :] = 0
+        mean[:, MAX_WICKETS] = 0
+        var[0, :] = 0
+        var[:, MAX_WICKETS] = 0
+        sd = np.maximum(np.sqrt(var), MIN_SD)
+
+        chase, first = cls._win_tables(mean, sd, max_balls * MAX_RUNS_PER_BALL)
+        return cls(mean, sd, chase, first, max_balls)
+
+    @staticmethod
+    def _win_tables(mean, sd, max_runs):
+        runs = np.arange(max_runs + 1)
+        mean = mean[:, :, None]
+        sd = sd[:, :, None]
+
+        # Scoring at least r more runs, with a continuity correction for whole runs
+        chase = 1 - _normal_cdf((runs - 0.5 - mean) / sd)
+        chase[:, :, 0] = 1
+
+        # Distribution of the runs to come on the same axis, the last bucket holding the tail
+        upper = _normal_cdf((runs + 0.5 - mean) / sd)
+        upper[:, :, -1] = 1
+        lower = np.concatenate([np.zeros(upper.shape[:2] + (1,)), upper[:, :, :-1]], axis=2)
+        runs_to_come = upper - lower
+
+        # The side batting first wins from a total t unless a chase of t + 1 from the start succeeds
+        totals = np.minimum(runs[:, None] + runs[None, :] + 1, max_runs)
+        defended = 1 - chase[-1, 0][totals]
+        first = runs_to_come @ defended.T
+        return chase, np.clip(first, 0, 1)
+
+    def save(self, path):
+        np.savez_compressed(
+            path, mean=self.mean, sd=self.sd, chase=self.chase, first=self.first, max_balls=self.max_balls
+        )
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            print(f"Error: Model file '{path}' not found.")
+            return None
+        with np.load(path) as tables:
+            return cls(
+                tables["mean"], tables["sd"], tables["chase"], tables["first"], int(tables["max_balls"])
+            )
+
+    def predict(self, score, wickets, balls_bowled, target=None):
+        """Return (projected score, batting side's win probability) for one live ball.
+
+        Without a target the batting side is batting first.
+        """
+        balls = min(max(self.max_balls - balls_bowled, 0), self.max_balls)
+        wickets = min(max(wickets, 0), MAX_WICKETS)
+        projected = score + float(self.mean[balls, wickets])
+        if target is None:
+            return projected, float(self.first[balls, wickets, min(max(score, 0), self.max_runs)])
+        needed = target - score
+        if needed <= 0:
+            return projected, 1.0
+        return projected, float(self.chase[balls, wickets, min(needed, self.max_runs)])
+
+    @ins.traced("winprob.score")
+    def score(self, df, match_format=DEFAULT_FORMAT):
+        """Add the match state after every delivery of the first two innings.
+
+        Returns a copy of df with projected_score, win_probability (of the
+        batting side) and first_win_probability (of the side batting first).
+        Rows of later innings, or second innings without a first innings, are NaN.
+        """
+        if "legal_ball" not in df.columns:
+            df = preprocessing.preprocess(df.copy(), PHASE_DEFINITIONS[match_format])
+        df = df.copy()
+        innings = df["innings"].to_numpy()
+        score = df["score"].to_numpy().astype("int64")
+        legal = df["legal"].to_numpy()
+        # Extras carry the number of the next legal ball
+        balls_bowled = df["legal_ball"].to_numpy().astype("int64") - ~legal
+        balls = np.clip(self.max_balls - balls_bowled, 0, self.max_balls)
+        wickets = np.clip(df["wicketfell"].to_numpy().astype("int64"), 0, MAX_WICKETS)
+
+        totals = df[df["innings"] == 1].groupby("matchid", observed=True)["score"].last()
+        target = df["matchid"].map(totals).to_numpy().astype("float64") + 1
+        needed = np.nan_to_num(target - score, nan=0).astype("int64")
+
+        first = self.first[balls, wickets, np.clip(score, 0, self.max_runs)]
+        chase = np.where(needed <= 0, 1, self.chase[balls, wickets, np.clip(needed, 0, self.max_runs)])
+        chase = np.where(np.isnan(target), np.nan, chase)
+
+        df["projected_score"] = np.where(innings <= 2, score + self.mean[balls, wickets], np.nan)
+        df["first_win_probability"] = np.select([innings == 1, innings == 2], [first, 1 - chase], np.nan)
+        df["win_probability"] = np.select([innings == 1, innings == 2], [first, chase], np.nan)
+        ins.count("balls_scored", len(df))
+        return df
+
+    def start_probability(self):
+        """Win probability of the side batting first before a ball is bowled."""
+        return float(self.first[self.max_balls, 0, 0])
+
+
+def turning_points(scored, count=3, start=None):
+    """Return the overs with the largest swings in win probability, count per match.
+
+    swing is the change in the probability that the side batting first wins
+    across the over, so positive swings favour the side batting first. start is
+    the probability before the first ball; without it the first ball has no swing.
+    """
+    scored = scored[scored["first_win_probability"].notna()]
+    probability = scored["first_win_probability"]
+    before = probability.groupby(scored["matchid"], sort=False, observed=True).shift()
+    before = before.fillna(probability if start is None else start)
+    scored = scored.assign(swing=probability - before)
+
+    overs = scored.groupby(OVER_KEYS, sort=False, observed=True).agg(
+        battingteam=("battingteam", "first"),
+        runs=("total", "sum"),
+        wickets=("wicket", "sum"),
+        swing=("swing", "sum"),
+        first_win_probability=("first_win_probability", "last"),
+    ).reset_index()
+    overs["magnitude"] = overs["swing"].abs()
+    overs = overs.sort_values(["matchid", "magnitude"], ascending=[True, False], kind="stable")
+    overs = overs.groupby("matchid", sort=False, observed=True).head(count)
+    return overs.drop(columns="magnitude").reset_index(drop=True)
+
+
+def main(argv=None):
+    from season import Season
+
+    parser = argparse.ArgumentParser(description="Win probability and turning points of a season.")
+    parser.add_argument("data_dir", help="directory containing the match files")
+    parser.add_argument("--format", default=DEFAULT_FORMAT, choices=sorted(PHASE_DEFINITIONS))
+    parser.add_argument("--model", help="model file (.npz); trained and saved here when missing")
+    parser.add_argument("--turning-points", type=int, default=3, help="overs listed per match")
+    args = parser.parse_args(argv)
+
+    season = Season(args.data_dir)
+    season.load()
+    if season.df is None:
+        return
+    season.df = preprocessing.preprocess(season.df, PHASE_DEFINITIONS[args.format])
+
+    model = None
+    if args.model and os.path.exists(args.model):
+        model = WinProbabilityModel.load(args.model)
+    if model is None:
+        model = WinProbabilityModel.fit(season.df, args.format)
+        if model is None:
+            return
+        if args.model:
+            model.save(args.model)
+
+    print(f"Batting first wins {model.start_probability():.1%} of the time before a ball is bowled.")
+    scored = model.score(season.df, args.format)
+    points = turning_points(scored, args.turning_points, model.start_probability())
+    print(points.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+
+
+if __name__ == "__main__":
+    main()